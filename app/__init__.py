@@ -2,20 +2,34 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from config import config
+from app.instrumentation import SQLInstrumentation
+from app.cache import PageCache
+from app.database import RoutingSession, configure_engine_options, configure_engines
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
+instrumentation = SQLInstrumentation()
+cache = PageCache()
 
-def create_app(config_name='default'):
-    """Application factory pattern."""
+def create_app(config_name='default', overrides=None):
+    """Application factory pattern.
+
+    `overrides` are config values applied on top of the named config, e.g. by tests.
+    """
     app = Flask(__name__)
     app.config.from_object(config[config_name])
+    if overrides:
+        app.config.update(overrides)
     
     # Initialize extensions
+    configure_engine_options(app)
     db.init_app(app)
+    configure_engines(app, db)
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Bitte melden Sie sich an, um diese Seite zu sehen.'
+    instrumentation.init_app(app)
+    cache.init_app(app)
     
     # Register blueprints
     from app.main import main as main_blueprint
@@ -27,6 +41,10 @@ def create_app(config_name='default'):
     from app.admin import admin as admin_blueprint
     app.register_blueprint(admin_blueprint, url_prefix='/admin')
     
+    # CLI commands
+    from app.commands import register_commands
+    register_commands(app)
+    
     # Error handlers
     @app.errorhandler(404)
     def page_not_found(e):
@@ -1,11 +1,26 @@
-from flask import render_template, redirect, url_for, flash, request, current_app
+import tempfile
+import time
+from flask import render_template, redirect, url_for, flash, request, current_app, abort, send_file, \
+    Response, stream_with_context
 from flask_login import login_required, current_user
 from app import db
 from app.admin import admin
-from app.models import Event, Player, News, ClothingRule, Invite, User
-from app.forms import EventForm, PlayerForm, NewsForm, ClothingRuleForm, UserForm
+from app.models import Event, EventSeries, Player, News, ClothingRule, Invite, User, PlayerAttendanceStats, \
+    season_of, SERIES_EVENT_FIELDS, WEEKDAYS
+from app.forms import EventForm, EventSeriesForm, PlayerForm, NewsForm, ClothingRuleForm, UserForm, \
+    BulkInviteForm, PlayerImportForm
+from app.database import read_only
+from app.pagination import paginate_request
+from app.export import EXPORTS, export_rows, iter_csv, write_xlsx
+from app.notifications import notify_event_invites, notify_invite, notify_news
+from app.player_import import import_players_file
+from app.recurrence import apply_series_changes, by_start, cancel_occurrence, expand, find_occurrence, \
+    materialize, parse_day
+from app.rsvp import promote_waitlist
+from app.search import search as search_index
 from datetime import datetime, date
-from sqlalchemy import func
+from itertools import islice
+from sqlalchemy import func, select, update
 
 @admin.before_request
 @login_required
@@ -13,37 +28,76 @@ def require_login():
     """Ensure all admin routes require login."""
     pass
 
+# Per-process cache of the dashboard figures, see DASHBOARD_CACHE_SECONDS
+_dashboard_stats_cache = {'expires': 0, 'stats': None}
+
+@admin.record_once
+def _config_defaults(state):
+    state.app.config.setdefault('DASHBOARD_CACHE_SECONDS', 5)
+
+def _dashboard_stats():
+    """All dashboard figures from one statement of scalar subqueries."""
+    today = date.today()
+    counts = {
+        'total_events': select(func.count(Event.id)),
+        'upcoming_events': select(func.count(Event.id)).where(Event.date >= today),
+        'total_players': select(func.count(Player.id)).where(Player.active == True),
+        'total_news': select(func.count(News.id)).where(News.published == True),
+        # Read from the RSVP counters instead of aggregating the invite table
+        'confirmed_invites': select(func.coalesce(func.sum(Event.confirmed_count), 0)),
+        'declined_invites': select(func.coalesce(func.sum(Event.declined_count), 0)),
+        'waitlisted_invites': select(func.coalesce(func.sum(Event.waitlisted_count), 0)),
+        'pending_invites': select(func.coalesce(func.sum(Event.pending_count), 0)),
+        'upcoming_pending_invites': select(func.coalesce(func.sum(Event.pending_count), 0))
+            .where(Event.date >= today),
+    }
+    row = db.session.execute(
+        select(*[query.scalar_subquery().label(name) for name, query in counts.items()])
+    ).one()
+    stats = row._asdict()
+    responded = stats['confirmed_invites'] + stats['declined_invites'] + stats['waitlisted_invites']
+    total_invites = responded + stats['pending_invites']
+    stats['total_invites'] = total_invites
+    stats['response_rate'] = responded / total_invites if total_invites else None
+    stats['confirmation_rate'] = stats['confirmed_invites'] / responded if responded else None
+    return stats
+
+def dashboard_stats():
+    """The dashboard figures, recomputed at most every DASHBOARD_CACHE_SECONDS."""
+    timeout = current_app.config['DASHBOARD_CACHE_SECONDS']
+    now = time.monotonic()
+    if timeout <= 0 or _dashboard_stats_cache['expires'] <= now:
+        _dashboard_stats_cache['stats'] = _dashboard_stats()
+        _dashboard_stats_cache['expires'] = now + timeout
+    return _dashboard_stats_cache['stats']
+
 @admin.route('/dashboard')
 def dashboard():
     """Admin dashboard with statistics."""
-    # Get statistics
-    total_events = Event.query.count()
-    upcoming_events = Event.query.filter(Event.date >= date.today()).count()
-    total_players = Player.query.filter_by(active=True).count()
-    total_news = News.query.filter_by(published=True).count()
+    stats = dashboard_stats()
     
     # Get recent activities
     recent_events = Event.query.order_by(Event.created_at.desc()).limit(5).all()
     recent_players = Player.query.order_by(Player.created_at.desc()).limit(5).all()
     
     return render_template('admin/dashboard.html',
-                         total_events=total_events,
-                         upcoming_events=upcoming_events,
-                         total_players=total_players,
-                         total_news=total_news,
                          recent_events=recent_events,
-                         recent_players=recent_players)
+                         recent_players=recent_players,
+                         **stats)
+
+@admin.route('/search')
+def search():
+    """Search all news, events and players including unpublished and inactive ones."""
+    query = request.args.get('q', '').strip()
+    results = search_index(query, include_hidden=True) if query else None
+    return render_template('search.html', query=query, results=results,
+                         search_endpoint='admin.search')
 
 # Event Management
 @admin.route('/events')
 def events():
     """List all events."""
-    page = request.args.get('page', 1, type=int)
-    pagination = Event.query.order_by(Event.date.desc(), Event.time.desc()).paginate(
-        page=page,
-        per_page=current_app.config['ITEMS_PER_PAGE'],
-        error_out=False
-    )
+    pagination = paginate_request(Event.query, [Event.date, Event.time, Event.id], descending=True)
     events = pagination.items
     return render_template('admin/events.html', events=events, pagination=pagination)
 
@@ -81,8 +135,13 @@ def edit_event(id):
         event.time = form.time.data
         event.location = form.location.data
         event.max_participants = form.max_participants.data
+        db.session.flush()
+        # More seats may have been added
+        promoted = promote_waitlist(event.id)
         db.session.commit()
         flash('Event wurde erfolgreich aktualisiert!', 'success')
+        if promoted:
+            flash(f'{promoted} Spieler sind von der Warteliste nachgerückt.', 'info')
         return redirect(url_for('admin.events'))
     return render_template('admin/event_form.html', form=form, title='Event bearbeiten')
 
@@ -90,6 +149,9 @@ def edit_event(id):
 def delete_event(id):
     """Delete event."""
     event = Event.query.get_or_404(id)
+    if event.series_id is not None:
+        # Otherwise the series rule brings the date back
+        cancel_occurrence(event.series, event.occurrence_date)
     db.session.delete(event)
     db.session.commit()
     flash('Event wurde erfolgreich gelöscht!', 'success')
@@ -101,26 +163,25 @@ def event_invites(id):
     event = Event.query.get_or_404(id)
     
     # Get all players not yet invited
-    invited_player_ids = [i.player_id for i in event.invites]
-    available_players = Player.query.filter(
-        ~Player.id.in_(invited_player_ids),
-        Player.active == True
-    ).order_by(Player.last_name, Player.first_name).all()
+    available_players = Player.not_invited_to(id).order_by(
+        Player.last_name, Player.first_name
+    ).all()
     
     # Get current invitations
-    invites = Invite.query.filter_by(event_id=id).join(Player).order_by(
-        Invite.status, Player.last_name, Player.first_name
+    invites = Invite.for_event(id).order_by(
+        Invite.status, Invite.waitlist_position, Player.last_name, Player.first_name
     ).all()
     
     return render_template('admin/event_invites.html', 
                          event=event, 
                          invites=invites,
-                         available_players=available_players)
+                         available_players=available_players,
+                         bulk_form=BulkInviteForm())
 
 @admin.route('/event/<int:event_id>/invite/<int:player_id>', methods=['POST'])
 def send_invite(event_id, player_id):
     """Send invitation to a player."""
-    event = Event.query.get_or_404(event_id)
+    Event.query.get_or_404(event_id)
     player = Player.query.get_or_404(player_id)
     
     # Check if invite already exists
@@ -130,37 +191,175 @@ def send_invite(event_id, player_id):
     else:
         invite = Invite(event_id=event_id, player_id=player_id)
         db.session.add(invite)
+        db.session.flush()
+        notify_invite(invite)
         db.session.commit()
         flash(f'Einladung an {player.full_name} wurde versendet!', 'success')
     
     return redirect(url_for('admin.event_invites', id=event_id))
 
+@admin.route('/event/<int:id>/invite/bulk', methods=['POST'])
+def send_bulk_invite(id):
+    """Invite a selection of players or a whole team in one statement."""
+    event = Event.query.get_or_404(id)
+    form = BulkInviteForm()
+    if not form.validate_on_submit():
+        flash('Ungültige Auswahl für die Sammeleinladung.', 'danger')
+        return redirect(url_for('admin.event_invites', id=id))
+    
+    player_ids = select(Player.id).where(Player.active == True)
+    selected_ids = request.form.getlist('player_ids', type=int)
+    if selected_ids:
+        player_ids = player_ids.where(Player.id.in_(selected_ids))
+    elif form.team_filter.data != 'all':
+        player_ids = player_ids.where(Player.team == form.team_filter.data)
+    elif not form.select_all.data:
+        flash('Keine Spieler ausgewählt.', 'warning')
+        return redirect(url_for('admin.event_invites', id=id))
+    
+    inserted, skipped = Invite.bulk_create(event.id, player_ids)
+    if inserted:
+        notify_event_invites(event.id)
+    db.session.commit()
+    flash(f'{inserted} Einladungen wurden versendet, {skipped} bestanden bereits.', 'success')
+    return redirect(url_for('admin.event_invites', id=id))
+
 @admin.route('/invite/<int:id>/delete', methods=['POST'])
 def delete_invite(id):
     """Delete an invitation."""
     invite = Invite.query.get_or_404(id)
     event_id = invite.event_id
     db.session.delete(invite)
+    db.session.flush()
+    promoted = promote_waitlist(event_id)
     db.session.commit()
     flash('Einladung wurde gelöscht!', 'success')
+    if promoted:
+        flash(f'{promoted} Spieler sind von der Warteliste nachgerückt.', 'info')
     return redirect(url_for('admin.event_invites', id=event_id))
 
+# Event Series Management
+def _fill_series(series, form):
+    series.title = form.title.data
+    series.description = form.description.data
+    series.event_type = form.event_type.data
+    series.time = form.time.data
+    series.location = form.location.data
+    series.max_participants = form.max_participants.data
+    series.frequency = form.frequency.data
+    series.interval = form.interval.data
+    series.weekdays = ','.join(code for code in WEEKDAYS if code in form.weekdays.data) or None
+    series.start_date = form.start_date.data
+    series.until = form.until.data
+
+@admin.route('/series')
+def series_list():
+    """List all event series."""
+    series = EventSeries.query.order_by(EventSeries.start_date.desc(), EventSeries.id.desc()).all()
+    return render_template('admin/series.html', series=series)
+
+@admin.route('/series/new', methods=['GET', 'POST'])
+def new_series():
+    """Create a recurring event; a whole season of dates is a single row."""
+    form = EventSeriesForm()
+    if form.validate_on_submit():
+        series = EventSeries(created_by=current_user.id)
+        _fill_series(series, form)
+        db.session.add(series)
+        db.session.commit()
+        flash('Terminserie wurde erfolgreich erstellt!', 'success')
+        return redirect(url_for('admin.series_detail', id=series.id))
+    return render_template('admin/series_form.html', form=form, title='Neue Terminserie')
+
+@admin.route('/series/<int:id>')
+def series_detail(id):
+    """Upcoming dates of a series, with and without an event row."""
+    series = EventSeries.query.get_or_404(id)
+    today = date.today()
+    events = series.events.filter(Event.date >= today).order_by(Event.date, Event.time).limit(20).all()
+    occurrences = list(islice(by_start(events, expand([series], today)), 20))
+    return render_template('admin/series_detail.html', series=series, occurrences=occurrences)
+
+@admin.route('/series/<int:id>/edit', methods=['GET', 'POST'])
+def edit_series(id):
+    """Edit a series; upcoming materialized dates follow unless edited on their own."""
+    series = EventSeries.query.get_or_404(id)
+    form = EventSeriesForm(obj=series, weekdays=series.weekdays.split(',') if series.weekdays else [])
+    if form.validate_on_submit():
+        previous = {name: getattr(series, name) for name in SERIES_EVENT_FIELDS}
+        _fill_series(series, form)
+        resized = apply_series_changes(series, previous)
+        db.session.flush()
+        # More seats may have been added
+        promoted = sum(promote_waitlist(event.id) for event in resized)
+        db.session.commit()
+        flash('Terminserie wurde erfolgreich aktualisiert!', 'success')
+        if promoted:
+            flash(f'{promoted} Spieler sind von der Warteliste nachgerückt.', 'info')
+        return redirect(url_for('admin.series_detail', id=id))
+    return render_template('admin/series_form.html', form=form, title='Terminserie bearbeiten')
+
+@admin.route('/series/<int:id>/delete', methods=['POST'])
+def delete_series(id):
+    """Delete a series; its materialized dates stay as single events."""
+    series = EventSeries.query.get_or_404(id)
+    detached = db.session.execute(
+        update(Event).where(Event.series_id == id).values(series_id=None, occurrence_date=None),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+    db.session.delete(series)
+    db.session.commit()
+    flash('Terminserie wurde erfolgreich gelöscht!', 'success')
+    if detached:
+        flash(f'{detached} Termine mit eigenem Event bleiben als einzelne Events erhalten.', 'info')
+    return redirect(url_for('admin.series_list'))
+
+def _occurrence_event(id, day):
+    series = EventSeries.query.get_or_404(id)
+    event = materialize(series, parse_day(day), created_by=current_user.id)
+    if event is None:
+        abort(404)
+    db.session.commit()
+    return event
+
+@admin.route('/series/<int:id>/<day>/invites', methods=['POST'])
+def occurrence_invites(id, day):
+    """Create the event row of a series date so players can be invited."""
+    event = _occurrence_event(id, day)
+    return redirect(url_for('admin.event_invites', id=event.id))
+
+@admin.route('/series/<int:id>/<day>/edit', methods=['POST'])
+def edit_occurrence(id, day):
+    """Create the event row of a series date to move or change it on its own."""
+    event = _occurrence_event(id, day)
+    return redirect(url_for('admin.edit_event', id=event.id))
+
+@admin.route('/series/<int:id>/<day>/cancel', methods=['POST'])
+def cancel_series_occurrence(id, day):
+    """Cancel one date of a series, including its invites."""
+    series = EventSeries.query.get_or_404(id)
+    day = parse_day(day)
+    occurrence = find_occurrence(series, day)
+    if occurrence is None:
+        abort(404)
+    if occurrence.id is not None:
+        db.session.delete(occurrence)
+    cancel_occurrence(series, day)
+    db.session.commit()
+    flash(f'Der Termin am {day.strftime("%d.%m.%Y")} wurde abgesagt.', 'success')
+    return redirect(url_for('admin.series_detail', id=id))
+
 # Player Management
 @admin.route('/players')
 def players():
     """List all players."""
-    page = request.args.get('page', 1, type=int)
     team_filter = request.args.get('team', 'all')
     
     query = Player.query
     if team_filter != 'all':
         query = query.filter_by(team=team_filter)
     
-    pagination = query.order_by(Player.last_name, Player.first_name).paginate(
-        page=page,
-        per_page=current_app.config['ITEMS_PER_PAGE'],
-        error_out=False
-    )
+    pagination = paginate_request(query, [Player.last_name, Player.first_name, Player.id])
     players = pagination.items
     
     return render_template('admin/players.html', 
@@ -190,6 +389,27 @@ def new_player():
         return redirect(url_for('admin.players'))
     return render_template('admin/player_form.html', form=form, title='Neuer Spieler')
 
+@admin.route('/players/import', methods=['GET', 'POST'])
+def import_players():
+    """Import or update players from a CSV file, matched by email."""
+    form = PlayerImportForm()
+    result = None
+    if form.validate_on_submit():
+        try:
+            result = import_players_file(form.file.data, dry_run=form.dry_run.data)
+        except UnicodeDecodeError:
+            flash('Die Datei ist nicht UTF-8-kodiert.', 'danger')
+            return render_template('admin/player_import.html', form=form, result=None)
+        if form.dry_run.data:
+            db.session.rollback()
+            flash(f'Prüfung: {result.inserted} neu, {result.updated} aktualisiert, '
+                  f'{len(result.errors)} Fehler.', 'info')
+        else:
+            db.session.commit()
+            flash(f'{result.inserted} Spieler importiert, {result.updated} aktualisiert, '
+                  f'{len(result.errors)} Fehler.', 'success' if not result.errors else 'warning')
+    return render_template('admin/player_import.html', form=form, result=result)
+
 @admin.route('/player/<int:id>/edit', methods=['GET', 'POST'])
 def edit_player(id):
     """Edit existing player."""
@@ -223,12 +443,7 @@ def delete_player(id):
 @admin.route('/news')
 def news():
     """List all news."""
-    page = request.args.get('page', 1, type=int)
-    pagination = News.query.order_by(News.created_at.desc()).paginate(
-        page=page,
-        per_page=current_app.config['ITEMS_PER_PAGE'],
-        error_out=False
-    )
+    pagination = paginate_request(News.query, [News.created_at, News.id], descending=True)
     news_items = pagination.items
     return render_template('admin/news.html', news=news_items, pagination=pagination)
 
@@ -244,6 +459,9 @@ def new_news():
             author_id=current_user.id
         )
         db.session.add(news)
+        if news.published:
+            db.session.flush()
+            notify_news(news)
         db.session.commit()
         flash('Nachricht wurde erfolgreich erstellt!', 'success')
         return redirect(url_for('admin.news'))
@@ -255,10 +473,13 @@ def edit_news(id):
     news_item = News.query.get_or_404(id)
     form = NewsForm(obj=news_item)
     if form.validate_on_submit():
+        was_published = news_item.published
         news_item.title = form.title.data
         news_item.content = form.content.data
         news_item.published = form.published.data
         news_item.updated_at = datetime.utcnow()
+        if news_item.published and not was_published:
+            notify_news(news_item)
         db.session.commit()
         flash('Nachricht wurde erfolgreich aktualisiert!', 'success')
         return redirect(url_for('admin.news'))
@@ -318,6 +539,50 @@ def delete_clothing_rule(id):
     flash('Kleidungsregel wurde erfolgreich gelöscht!', 'success')
     return redirect(url_for('admin.clothing_rules'))
 
+# Statistics
+@admin.route('/statistics')
+@read_only()
+def statistics():
+    """Attendance per player and team, read from the materialized statistics."""
+    season = request.args.get('season', season_of(date.today()), type=int)
+    team = request.args.get('team') or None
+    event_type = request.args.get('event_type') or None
+    
+    filters = [PlayerAttendanceStats.season == season]
+    if team:
+        filters.append(Player.team == team)
+    if event_type:
+        filters.append(PlayerAttendanceStats.event_type == event_type)
+    sums = [
+        func.sum(PlayerAttendanceStats.invited).label('invited'),
+        func.sum(PlayerAttendanceStats.confirmed).label('confirmed'),
+        func.sum(PlayerAttendanceStats.declined).label('declined'),
+        func.sum(PlayerAttendanceStats.pending).label('pending'),
+    ]
+    players = db.session.execute(
+        select(Player.id, Player.first_name, Player.last_name, Player.team, *sums)
+        .join(PlayerAttendanceStats, PlayerAttendanceStats.player_id == Player.id)
+        .where(*filters)
+        .group_by(Player.id, Player.first_name, Player.last_name, Player.team)
+        .order_by(Player.last_name, Player.first_name)
+    ).all()
+    teams = db.session.execute(
+        select(Player.team, *sums)
+        .join(PlayerAttendanceStats, PlayerAttendanceStats.player_id == Player.id)
+        .where(*filters)
+        .group_by(Player.team)
+        .order_by(Player.team)
+    ).all()
+    seasons = PlayerAttendanceStats.seasons()
+    
+    return render_template('admin/statistics.html',
+                         players=players,
+                         teams=teams,
+                         seasons=seasons or [season],
+                         season=season,
+                         team=team,
+                         event_type=event_type)
+
 # User Management
 @admin.route('/users')
 def users():
@@ -340,3 +605,33 @@ def new_user():
         flash('Benutzer wurde erfolgreich erstellt!', 'success')
         return redirect(url_for('admin.users'))
     return render_template('admin/user_form.html', form=form, title='Neuer Benutzer')
+
+# Export
+@admin.route('/export/<name>.<fmt>')
+def export(name, fmt):
+    """Download players, events or the attendance matrix as CSV or XLSX."""
+    if name not in EXPORTS or fmt not in ('csv', 'xlsx'):
+        abort(404)
+    filters = {
+        'team': request.args.get('team') or None,
+        'start': request.args.get('start', type=date.fromisoformat),
+        'end': request.args.get('end', type=date.fromisoformat),
+    }
+    rows = export_rows(name, **filters)
+    
+    if fmt == 'csv':
+        response = Response(stream_with_context(iter_csv(rows)), mimetype='text/csv')
+        response.headers['Content-Disposition'] = f'attachment; filename="{name}.csv"'
+        return response
+    
+    # XLSX is a zip archive and cannot be streamed, openpyxl spools it to disk
+    target = tempfile.TemporaryFile()
+    try:
+        write_xlsx(rows, target, name)
+    except RuntimeError as e:
+        target.close()
+        flash(str(e), 'danger')
+        return redirect(url_for('admin.dashboard'))
+    target.seek(0)
+    return send_file(target, as_attachment=True, download_name=f'{name}.xlsx',
+                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
@@ -0,0 +1,204 @@
+import os
+import pickle
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+from functools import wraps
+from time import time
+from flask import current_app, has_app_context, request, session
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.database import primary_only
+
+class NullCache:
+    """Backend that stores nothing, used when caching is switched off."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+class MemoryCache:
+    """In-process LRU cache with a per-entry TTL."""
+
+    def __init__(self, max_entries=500, default_timeout=300):
+        self.max_entries = max_entries
+        self.default_timeout = default_timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires and expires < time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        timeout = self.default_timeout if timeout is None else timeout
+        with self._lock:
+            self._entries[key] = (value, time() + timeout if timeout else None)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+class SQLiteCache:
+    """Cache stored in a SQLite file so several worker processes share it."""
+
+    def __init__(self, path, default_timeout=300):
+        self.path = path
+        self.default_timeout = default_timeout
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS cache '
+                         '(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)')
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT value, expires FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None or (row[1] and row[1] < time()):
+            return None
+        return pickle.loads(row[0])
+
+    def set(self, key, value, timeout=None):
+        timeout = self.default_timeout if timeout is None else timeout
+        with self._connection() as conn:
+            conn.execute('INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                         (key, pickle.dumps(value), time() + timeout if timeout else None))
+            conn.execute('DELETE FROM cache WHERE expires < ?', (time(),))
+
+    def delete(self, key):
+        with self._connection() as conn:
+            conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+def _model_tag(model):
+    return model if isinstance(model, str) else model.__name__
+
+class PageCache:
+    """Cache for rendered public pages, invalidated by model tags.
+
+    CACHE_TYPE selects the backend: 'null' (default), 'memory' or 'sqlite'
+    (CACHE_SQLITE_PATH, shared by all workers). Every cached page is tagged
+    with the models it shows. Committing a session that inserted, changed or
+    deleted rows of a model bumps that model's tag version, which makes exactly
+    the pages tagged with it unreachable.
+    """
+
+    def __init__(self, app=None):
+        self.backend = NullCache()
+        self.default_timeout = 300
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_TYPE', 'null')
+        app.config.setdefault('CACHE_DEFAULT_TIMEOUT', 300)
+        app.config.setdefault('CACHE_MAX_ENTRIES', 500)
+        app.config.setdefault('CACHE_SQLITE_PATH', os.path.join(app.instance_path, 'page_cache.sqlite'))
+
+        self.default_timeout = app.config['CACHE_DEFAULT_TIMEOUT']
+        cache_type = app.config['CACHE_TYPE']
+        if cache_type == 'memory':
+            self.backend = MemoryCache(app.config['CACHE_MAX_ENTRIES'], self.default_timeout)
+        elif cache_type == 'sqlite':
+            os.makedirs(os.path.dirname(app.config['CACHE_SQLITE_PATH']), exist_ok=True)
+            self.backend = SQLiteCache(app.config['CACHE_SQLITE_PATH'], self.default_timeout)
+        elif cache_type == 'null':
+            self.backend = NullCache()
+        else:
+            raise ValueError(f'Unknown CACHE_TYPE {cache_type!r}')
+
+        app.extensions['page_cache'] = self
+        if not event.contains(Session, 'after_flush', _collect_flushed_tags):
+            event.listen(Session, 'after_flush', _collect_flushed_tags)
+            event.listen(Session, 'do_orm_execute', _collect_executed_tags)
+            event.listen(Session, 'after_commit', _invalidate_committed_tags)
+            event.listen(Session, 'after_rollback', _discard_tags)
+
+    def _tag_version(self, tag):
+        key = f'tag:{tag}'
+        version = self.backend.get(key)
+        if version is None:
+            # A fresh random version, so an evicted tag can never revive old pages
+            version = uuid.uuid4().hex[:12]
+            self.backend.set(key, version, timeout=0)
+        return version
+
+    def invalidate(self, *models):
+        """Bump the tag version of the given models."""
+        for model in models:
+            self.backend.set(f'tag:{_model_tag(model)}', uuid.uuid4().hex[:12], timeout=0)
+
+    def cached(self, *models, timeout=None):
+        """Cache the rendered page of an anonymous GET request, tagged with `models`."""
+        tags = [_model_tag(model) for model in models]
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if (request.method != 'GET' or current_user.is_authenticated
+                        or session.get('_flashes')):
+                    return view(*args, **kwargs)
+                versions = ','.join(f'{tag}={self._tag_version(tag)}' for tag in tags)
+                query = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+                key = f'page:{request.path}?{query}|{versions}'
+                page = self.backend.get(key)
+                if page is None:
+                    # A replica that lags behind the bumped tag version would store
+                    # the old data under the new key until the entry expires
+                    with primary_only():
+                        page = view(*args, **kwargs)
+                    if not isinstance(page, str):
+                        return page
+                    self.backend.set(key, page, timeout)
+                return page
+            return wrapper
+        return decorator
+
+def _pending_tags(session):
+    return session.info.setdefault('cache_tags', set())
+
+def _collect_flushed_tags(session, flush_context):
+    tags = _pending_tags(session)
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        tags.add(type(obj).__name__)
+
+def _collect_executed_tags(orm_execute_state):
+    # Set-based INSERT/UPDATE/DELETE statements bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None:
+            _pending_tags(orm_execute_state.session).add(mapper.class_.__name__)
+
+def _invalidate_committed_tags(session):
+    tags = session.info.pop('cache_tags', None)
+    if tags and has_app_context() and 'page_cache' in current_app.extensions:
+        current_app.extensions['page_cache'].invalidate(*tags)
+
+def _discard_tags(session):
+    session.info.pop('cache_tags', None)
@@ -0,0 +1,123 @@
+import os
+import socket
+from time import sleep
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import func, select
+from app import db
+from app.models import Event, PlayerAttendanceStats
+from app.export import EXPORTS, export_rows, iter_csv, write_xlsx
+from app.player_import import import_players
+from app.jobs import run_jobs
+from app.search import create_search_index
+from app.database import copy_database
+
+@click.command('repair-invite-counts')
+@with_appcontext
+def repair_invite_counts():
+    """Recompute the RSVP counters of all events from the invite table."""
+    updated = Event.refresh_invite_counts()
+    db.session.commit()
+    click.echo(f'RSVP-Zähler für {updated} Events neu berechnet.')
+
+@click.command('export')
+@click.argument('name', type=click.Choice(EXPORTS))
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--team', help='Nur Spieler dieses Teams.')
+@click.option('--start', type=click.DateTime(['%Y-%m-%d']), help='Events ab diesem Datum.')
+@click.option('--end', type=click.DateTime(['%Y-%m-%d']), help='Events bis zu diesem Datum.')
+@with_appcontext
+def export(name, path, team, start, end):
+    """Write the players, events or attendance export to a .csv or .xlsx file."""
+    rows = export_rows(name, team=team,
+                       start=start.date() if start else None,
+                       end=end.date() if end else None)
+    if path.endswith('.xlsx'):
+        try:
+            write_xlsx(rows, path, name)
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+    else:
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            f.writelines(iter_csv(rows))
+    click.echo(f'Export {name} nach {path} geschrieben.')
+
+@click.command('import-players')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--dry-run', is_flag=True, help='Nur prüfen, nichts speichern.')
+@with_appcontext
+def import_players_command(path, dry_run):
+    """Import or update players from a CSV file, matched by email."""
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        result = import_players(f, dry_run=dry_run)
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+    for line, message in result.errors:
+        click.echo(f'Zeile {line}: {message}', err=True)
+    click.echo(f'{result.inserted} neu, {result.updated} aktualisiert, {len(result.errors)} Fehler.')
+
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_search_index():
+    """Create the FTS5 search tables and triggers and refill them."""
+    with db.engine.begin() as connection:
+        available = create_search_index(connection, rebuild=True)
+    if available:
+        click.echo('Suchindex neu aufgebaut.')
+    else:
+        click.echo('FTS5 ist nicht verfügbar, die Suche nutzt LIKE-Abfragen.')
+
+@click.command('rebuild-attendance-stats')
+@with_appcontext
+def rebuild_attendance_stats():
+    """Recompute the attendance statistics from all invites in one pass."""
+    PlayerAttendanceStats.rebuild(db.session.connection())
+    db.session.commit()
+    rows = db.session.scalar(select(func.count()).select_from(PlayerAttendanceStats))
+    click.echo(f'Anwesenheitsstatistik neu berechnet ({rows} Zeilen).')
+
+@click.command('sync-replica')
+@with_appcontext
+def sync_replica():
+    """Copy the primary SQLite database to the replica bind (local stand-in for replication)."""
+    key = current_app.config.get('SQLALCHEMY_REPLICA_BIND')
+    if key not in db.engines:
+        raise click.ClickException('Kein Replikat konfiguriert (SQLALCHEMY_REPLICA_BIND).')
+    try:
+        copy_database(str(db.engines[None].url), str(db.engines[key].url))
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Primäre Datenbank nach {db.engines[key].url.database} kopiert.')
+
+@click.command('run-worker')
+@click.option('--batch-size', default=50, show_default=True, help='Jobs pro Durchgang.')
+@click.option('--interval', default=2.0, show_default=True, help='Wartezeit in Sekunden, wenn kein Job fällig ist.')
+@click.option('--once', is_flag=True, help='Nur fällige Jobs abarbeiten und dann beenden.')
+@with_appcontext
+def run_worker(batch_size, interval, once):
+    """Run queued background jobs such as invitation and news mails."""
+    worker_id = f'{socket.gethostname()}:{os.getpid()}'
+    click.echo(f'Worker {worker_id} gestartet.')
+    total = 0
+    while True:
+        processed = run_jobs(worker_id, batch_size)
+        total += processed
+        db.session.remove()
+        if not processed:
+            if once:
+                break
+            sleep(interval)
+    click.echo(f'{total} Jobs ausgeführt.')
+
+def register_commands(app):
+    """Register the CLI commands with the application."""
+    app.cli.add_command(repair_invite_counts)
+    app.cli.add_command(export)
+    app.cli.add_command(import_players_command)
+    app.cli.add_command(rebuild_search_index)
+    app.cli.add_command(rebuild_attendance_stats)
+    app.cli.add_command(sync_replica)
+    app.cli.add_command(run_worker)
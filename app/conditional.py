@@ -0,0 +1,61 @@
+import hashlib
+from datetime import timezone
+from functools import wraps
+from flask import make_response, request, session
+from flask_login import current_user
+from sqlalchemy import func, inspect
+
+def dataset_validator(queries):
+    """Return (last_modified, etag) for the rows matched by the given queries.
+
+    Each query is reduced to max(updated_at) and the count of its model's primary
+    key, so edits bump the validator through updated_at and deletions through
+    the row count.
+    """
+    last_modified = None
+    parts = [current_user.get_id() or 'anonymous']
+    for query in queries:
+        model = query.column_descriptions[0]['entity']
+        newest, count = query.order_by(None).limit(None).offset(None).with_entities(
+            func.max(model.updated_at), func.count(inspect(model).primary_key[0])
+        ).one()
+        parts.append(f'{model.__name__}:{newest}:{count}')
+        if newest is not None and (last_modified is None or newest > last_modified):
+            last_modified = newest
+    etag = hashlib.sha1('|'.join(parts).encode()).hexdigest()
+    if last_modified is not None:
+        last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+    return last_modified, etag
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified is not None:
+        return request.if_modified_since >= last_modified
+    return False
+
+def conditional(datasets):
+    """Answer If-None-Match/If-Modified-Since with 304 before the view renders.
+
+    `datasets` is called with the view arguments and returns the queries whose
+    rows the page shows.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET' or session.get('_flashes'):
+                return view(*args, **kwargs)
+            last_modified, etag = dataset_validator(datasets(*args, **kwargs))
+            if _not_modified(etag, last_modified):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            response.vary.add('Cookie')
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,178 @@
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.dml import UpdateBase
+
+# Engine defaults, each can be overridden by the config key of the same name
+DEFAULTS = {
+    # Server databases (PostgreSQL, MySQL)
+    'DATABASE_POOL_SIZE': 10,
+    'DATABASE_MAX_OVERFLOW': 20,
+    'DATABASE_POOL_TIMEOUT': 30,
+    'DATABASE_POOL_RECYCLE': 1800,
+    # SQLite, applied as pragmas on every new connection
+    'SQLITE_BUSY_TIMEOUT': 5000,  # ms a writer waits for the lock before "database is locked"
+    'SQLITE_MMAP_SIZE': 256 * 1024 * 1024,
+    'SQLITE_CACHE_SIZE': -64000,  # negative: KiB, i.e. 64 MB page cache per connection
+    # Read replica: a key of SQLALCHEMY_BINDS, None disables the routing
+    'SQLALCHEMY_REPLICA_BIND': None,
+    # After a write the client reads from the primary for this many seconds
+    'REPLICA_PIN_SECONDS': 10,
+}
+
+# Blueprints whose queries may be answered by the replica
+REPLICA_BLUEPRINTS = ('main',)
+
+_read_only = ContextVar('read_only', default=False)
+_primary_only = ContextVar('primary_only', default=False)
+
+def _is_sqlite(url):
+    return make_url(url).get_backend_name() == 'sqlite'
+
+def _is_memory(url):
+    return make_url(url).database in (None, '', ':memory:')
+
+def engine_options(config, url):
+    """Pool options for the engine of `url`; SQLite keeps SQLAlchemy's own pool."""
+    if _is_sqlite(url):
+        return {}
+    return {
+        'pool_size': config['DATABASE_POOL_SIZE'],
+        'max_overflow': config['DATABASE_MAX_OVERFLOW'],
+        'pool_timeout': config['DATABASE_POOL_TIMEOUT'],
+        'pool_recycle': config['DATABASE_POOL_RECYCLE'],
+        'pool_pre_ping': True,
+    }
+
+def sqlite_pragmas(config, url):
+    """Pragmas for SQLite connections, in execution order.
+
+    WAL lets readers continue while one writer commits, and with WAL
+    synchronous=NORMAL only syncs on checkpoints, which is still durable against
+    application crashes. In-memory databases have no journal file or mmap.
+    """
+    pragmas = {}
+    if not _is_memory(url):
+        pragmas['journal_mode'] = 'WAL'
+        pragmas['synchronous'] = 'NORMAL'
+        pragmas['mmap_size'] = config['SQLITE_MMAP_SIZE']
+    pragmas['busy_timeout'] = config['SQLITE_BUSY_TIMEOUT']
+    pragmas['cache_size'] = config['SQLITE_CACHE_SIZE']
+    return pragmas
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """Run the pragmas on every connection the engine opens."""
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+
+def configure_engine_options(app):
+    """Merge the engine options into the config; call before db.init_app."""
+    for key, value in DEFAULTS.items():
+        app.config.setdefault(key, value)
+    url = app.config.get('SQLALCHEMY_DATABASE_URI')
+    if url:
+        options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+        for key, value in engine_options(app.config, url).items():
+            options.setdefault(key, value)
+    binds = app.config.get('SQLALCHEMY_BINDS') or {}
+    for key, bind in binds.items():
+        if isinstance(bind, str):
+            bind = {'url': bind}
+        for option, value in engine_options(app.config, bind['url']).items():
+            bind.setdefault(option, value)
+        binds[key] = bind
+
+def configure_engines(app, db):
+    """Install the SQLite pragmas on all engines; call after db.init_app."""
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                apply_sqlite_pragmas(engine, sqlite_pragmas(app.config, engine.url))
+
+@contextmanager
+def read_only():
+    """Mark the queries in this block as safe to answer from the replica.
+
+    Also usable as a decorator on views outside the replica blueprints.
+    """
+    token = _read_only.set(True)
+    try:
+        yield
+    finally:
+        _read_only.reset(token)
+
+@contextmanager
+def primary_only():
+    """Answer all queries in this block from the primary, e.g. for renders that
+    are stored and served beyond the replica's lag."""
+    token = _primary_only.set(True)
+    try:
+        yield
+    finally:
+        _primary_only.reset(token)
+
+def _pinned_to_primary():
+    """True if this request or a recent one of the same client has written."""
+    if not has_request_context():
+        return False
+    return g.get('_database_wrote', False) or session.get('_primary_until', 0) > time.time()
+
+def _wants_replica():
+    if _primary_only.get():
+        return False
+    if _read_only.get():
+        return True
+    return has_request_context() and request.blueprint in REPLICA_BLUEPRINTS
+
+class RoutingSession(Session):
+    """Session that answers read-only queries from the replica bind.
+
+    Flushes and INSERT/UPDATE/DELETE statements always use the primary and pin
+    the client to it, so the page shown after a write reads that write even if
+    replication lags behind.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        engines = self._db.engines
+        if bind is not None or engine is not engines.get(None):
+            return engine
+        if self._flushing or isinstance(clause, UpdateBase) or \
+                getattr(clause, '_for_update_arg', None) is not None:
+            if has_request_context():
+                g._database_wrote = True
+            return engine
+        replica = engines.get(current_app.config.get('SQLALCHEMY_REPLICA_BIND'))
+        if replica is None or not _wants_replica() or _pinned_to_primary():
+            return engine
+        return replica
+
+def _pin_after_commit(db_session):
+    if has_request_context() and g.get('_database_wrote'):
+        session['_primary_until'] = time.time() + current_app.config['REPLICA_PIN_SECONDS']
+
+event.listen(RoutingSession, 'after_commit', _pin_after_commit)
+
+def copy_database(source_url, target_url):
+    """Copy one SQLite database into another with the online backup API.
+
+    Stands in for replication when the replica is a second SQLite file.
+    """
+    if not (_is_sqlite(source_url) and _is_sqlite(target_url)):
+        raise ValueError('Only SQLite databases can be copied.')
+    source = sqlite3.connect(make_url(source_url).database)
+    target = sqlite3.connect(make_url(target_url).database)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
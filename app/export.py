@@ -0,0 +1,113 @@
+import csv
+import io
+from itertools import groupby
+from sqlalchemy import and_, select
+from app import db
+from app.models import Event, Player, Invite
+
+EXPORTS = ('players', 'events', 'attendance')
+
+# Rows are fetched through a server-side cursor in chunks of this size
+CHUNK_SIZE = 500
+
+def _stream(stmt):
+    return db.session.execute(stmt.execution_options(yield_per=CHUNK_SIZE))
+
+def _event_filters(start=None, end=None):
+    filters = []
+    if start is not None:
+        filters.append(Event.date >= start)
+    if end is not None:
+        filters.append(Event.date <= end)
+    return filters
+
+def player_rows(team=None):
+    """Header and one row per player."""
+    yield ['ID', 'Vorname', 'Nachname', 'E-Mail', 'Telefon', 'Position',
+           'Trikotnummer', 'Geburtsdatum', 'Team', 'Aktiv']
+    stmt = select(
+        Player.id, Player.first_name, Player.last_name, Player.email, Player.phone,
+        Player.position, Player.jersey_number, Player.birth_date, Player.team, Player.active
+    ).order_by(Player.last_name, Player.first_name, Player.id)
+    if team:
+        stmt = stmt.where(Player.team == team)
+    for row in _stream(stmt):
+        yield list(row)
+
+def event_rows(start=None, end=None):
+    """Header and one row per event with its RSVP counters."""
+    yield ['ID', 'Titel', 'Typ', 'Datum', 'Uhrzeit', 'Ort', 'Max. Teilnehmer',
+           'Zugesagt', 'Abgesagt', 'Offen', 'Warteliste']
+    stmt = select(
+        Event.id, Event.title, Event.event_type, Event.date, Event.time, Event.location,
+        Event.max_participants, Event.confirmed_count, Event.declined_count, Event.pending_count,
+        Event.waitlisted_count
+    ).where(*_event_filters(start, end)).order_by(Event.date, Event.time, Event.id)
+    for row in _stream(stmt):
+        yield list(row)
+
+def attendance_rows(start=None, end=None, team=None):
+    """Player x event matrix of invite statuses, one player row at a time.
+
+    Only the event header is held in memory; the invites are streamed ordered by
+    player and grouped into a row as soon as the next player starts.
+    """
+    events = db.session.execute(
+        select(Event.id, Event.title, Event.date)
+        .where(*_event_filters(start, end))
+        .order_by(Event.date, Event.time, Event.id)
+    ).all()
+    columns = {event.id: index for index, event in enumerate(events)}
+    yield ['Spieler', 'Team'] + [f'{event.date.isoformat()} {event.title}' for event in events]
+
+    event_ids = select(Event.id).where(*_event_filters(start, end))
+    stmt = select(
+        Player.id, Player.first_name, Player.last_name, Player.team, Invite.event_id, Invite.status
+    ).outerjoin(
+        Invite, and_(Invite.player_id == Player.id, Invite.event_id.in_(event_ids))
+    ).order_by(Player.last_name, Player.first_name, Player.id)
+    if team:
+        stmt = stmt.where(Player.team == team)
+
+    for _, invites in groupby(_stream(stmt), key=lambda row: row.id):
+        invites = list(invites)
+        cells = [''] * len(events)
+        for invite in invites:
+            if invite.event_id in columns:
+                cells[columns[invite.event_id]] = invite.status
+        player = invites[0]
+        yield [f'{player.first_name} {player.last_name}', player.team] + cells
+
+def export_rows(name, **filters):
+    """Rows of the named export, header first."""
+    if name == 'players':
+        return player_rows(team=filters.get('team'))
+    if name == 'events':
+        return event_rows(start=filters.get('start'), end=filters.get('end'))
+    if name == 'attendance':
+        return attendance_rows(**filters)
+    raise ValueError(f'Unknown export {name!r}')
+
+def iter_csv(rows):
+    """Encode rows as CSV chunks for a streamed response or file."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+    # BOM so Excel detects UTF-8
+    yield '\ufeff'
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+def write_xlsx(rows, target, title):
+    """Write rows to an XLSX file or file object with openpyxl's write-only mode."""
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise RuntimeError('Für den XLSX-Export muss openpyxl installiert sein.')
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(target)
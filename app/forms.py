@@ -1,6 +1,8 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, BooleanField, SubmitField, TextAreaField, SelectField, DateField, TimeField, IntegerField
-from wtforms.validators import DataRequired, Email, EqualTo, ValidationError, Length, Optional
+from flask_wtf.file import FileField, FileRequired, FileAllowed
+from wtforms import StringField, PasswordField, BooleanField, SubmitField, TextAreaField, SelectField, DateField, TimeField, IntegerField, \
+    SelectMultipleField
+from wtforms.validators import DataRequired, Email, EqualTo, ValidationError, Length, Optional, NumberRange
 from app.models import User, Player
 
 class LoginForm(FlaskForm):
@@ -26,6 +28,41 @@ class EventForm(FlaskForm):
     max_participants = IntegerField('Max. Teilnehmer', validators=[Optional()])
     submit = SubmitField('Speichern')
 
+class EventSeriesForm(FlaskForm):
+    """Form for creating/editing recurring events."""
+    title = StringField('Titel', validators=[DataRequired(), Length(max=100)])
+    description = TextAreaField('Beschreibung')
+    event_type = SelectField('Event-Typ', 
+                           choices=[('training', 'Training'), 
+                                   ('game', 'Spiel'), 
+                                   ('meeting', 'Meeting'), 
+                                   ('tournament', 'Turnier')],
+                           validators=[DataRequired()])
+    time = TimeField('Uhrzeit', validators=[DataRequired()])
+    location = StringField('Ort', validators=[Length(max=200)])
+    max_participants = IntegerField('Max. Teilnehmer', validators=[Optional()])
+    frequency = SelectField('Wiederholung', 
+                          choices=[('weekly', 'Wöchentlich'), 
+                                  ('daily', 'Täglich')],
+                          validators=[DataRequired()])
+    interval = IntegerField('Alle n Wochen/Tage', default=1, validators=[DataRequired(), NumberRange(min=1, max=52)])
+    weekdays = SelectMultipleField('Wochentage', 
+                                 choices=[('MO', 'Montag'), 
+                                         ('TU', 'Dienstag'), 
+                                         ('WE', 'Mittwoch'), 
+                                         ('TH', 'Donnerstag'), 
+                                         ('FR', 'Freitag'), 
+                                         ('SA', 'Samstag'), 
+                                         ('SU', 'Sonntag')],
+                                 validators=[Optional()])
+    start_date = DateField('Erster Termin', validators=[DataRequired()])
+    until = DateField('Letzter Termin', validators=[Optional()])
+    submit = SubmitField('Speichern')
+    
+    def validate_until(self, until):
+        if until.data and self.start_date.data and until.data < self.start_date.data:
+            raise ValidationError('Der letzte Termin liegt vor dem ersten.')
+
 class PlayerForm(FlaskForm):
     """Form for creating/editing players."""
     first_name = StringField('Vorname', validators=[DataRequired(), Length(max=50)])
@@ -54,6 +91,12 @@ class PlayerForm(FlaskForm):
             if player:
                 raise ValidationError('Diese E-Mail-Adresse wird bereits verwendet.')
 
+class PlayerImportForm(FlaskForm):
+    """Form for importing players from a CSV file."""
+    file = FileField('CSV-Datei', validators=[FileRequired(), FileAllowed(['csv'], 'Nur CSV-Dateien erlaubt.')])
+    dry_run = BooleanField('Nur prüfen')
+    submit = SubmitField('Importieren')
+
 class NewsForm(FlaskForm):
     """Form for creating/editing news."""
     title = StringField('Titel', validators=[DataRequired(), Length(max=200)])
@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+from flask import url_for
+
+# Events have no end time, calendar clients get this default length
+EVENT_DURATION = timedelta(hours=2)
+
+# Invite status -> iCalendar STATUS of the event in a personal feed
+INVITE_STATUS = {
+    'confirmed': 'CONFIRMED',
+    'pending': 'TENTATIVE',
+    'waitlisted': 'TENTATIVE',
+}
+
+def _escape(text):
+    return (text or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,') \
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+
+def _fold(line):
+    """Fold a content line to 75 octets as required by RFC 5545."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    while len(encoded) > 75:
+        cut = 75 if not parts else 74
+        # Do not split inside a multi-byte character
+        while cut and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+    parts.append(encoded.decode('utf-8'))
+    return '\r\n '.join(parts) + '\r\n'
+
+def _format_datetime(value):
+    return value.strftime('%Y%m%dT%H%M%S')
+
+def _series_lines(series, excluded, host):
+    """Lines of one recurring VEVENT; calendar clients expand the RRULE themselves."""
+    first = next(series.dates(series.start_date), None)
+    if first is None:
+        return []
+    start = datetime.combine(first, series.time)
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:series-{series.id}@{host}',
+        f'DTSTAMP:{_format_datetime(series.updated_at or start)}Z',
+        f'DTSTART:{_format_datetime(start)}',
+        f'DTEND:{_format_datetime(start + EVENT_DURATION)}',
+        f'RRULE:{series.rrule}',
+    ]
+    # Cancelled dates and materialized occurrences, the latter are VEVENTs of their own
+    if excluded:
+        lines.append('EXDATE:' + ','.join(_format_datetime(datetime.combine(day, series.time))
+                                          for day in excluded))
+    lines += [
+        f'SUMMARY:{_escape(series.title)}',
+        f'CATEGORIES:{_escape(series.event_type)}',
+        f'URL:{url_for("main.occurrence_detail", id=series.id, day=first.isoformat(), _external=True)}',
+    ]
+    if series.location:
+        lines.append(f'LOCATION:{_escape(series.location)}')
+    if series.description:
+        lines.append(f'DESCRIPTION:{_escape(series.description)}')
+    lines.append('END:VEVENT')
+    return lines
+
+def generate_ics(rows, name, host, series=()):
+    """Yield an iCalendar document line by line for the given event rows.
+
+    `rows` is any iterable of rows with id, title, description, location,
+    event_type, date, time and updated_at; an optional `status` column holds the
+    invite status of a personal feed. The rows are consumed lazily, so a
+    server-side cursor keeps memory flat for long histories. `series` yields
+    (EventSeries, excluded dates) pairs, each sent as one recurring VEVENT.
+    """
+    yield 'BEGIN:VCALENDAR\r\n'
+    yield 'VERSION:2.0\r\n'
+    yield 'PRODID:-//ClubConnect//Vereinskalender//DE\r\n'
+    yield 'CALSCALE:GREGORIAN\r\n'
+    yield _fold(f'X-WR-CALNAME:{_escape(name)}')
+    for row in rows:
+        start = datetime.combine(row.date, row.time)
+        lines = [
+            'BEGIN:VEVENT',
+            f'UID:event-{row.id}@{host}',
+            f'DTSTAMP:{_format_datetime(row.updated_at or start)}Z',
+            f'DTSTART:{_format_datetime(start)}',
+            f'DTEND:{_format_datetime(start + EVENT_DURATION)}',
+            f'SUMMARY:{_escape(row.title)}',
+            f'CATEGORIES:{_escape(row.event_type)}',
+            f'URL:{url_for("main.event_detail", id=row.id, _external=True)}',
+        ]
+        if row.location:
+            lines.append(f'LOCATION:{_escape(row.location)}')
+        if row.description:
+            lines.append(f'DESCRIPTION:{_escape(row.description)}')
+        status = getattr(row, 'status', None)
+        if status in INVITE_STATUS:
+            lines.append(f'STATUS:{INVITE_STATUS[status]}')
+        lines.append('END:VEVENT')
+        yield ''.join(_fold(line) for line in lines)
+    for item, excluded in series:
+        lines = _series_lines(item, excluded, host)
+        if lines:
+            yield ''.join(_fold(line) for line in lines)
+    yield 'END:VCALENDAR\r\n'
@@ -0,0 +1,130 @@
+import json
+import re
+from time import perf_counter
+from flask import current_app, g, has_app_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PARAMETER_LIST = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)')
+
+def normalize_sql(statement):
+    """Reduce a statement to its shape so identical queries group together."""
+    statement = _WHITESPACE.sub(' ', statement).strip()
+    statement = _STRING_LITERAL.sub('?', statement)
+    statement = _NUMBER_LITERAL.sub('?', statement)
+    return _PARAMETER_LIST.sub('(?...)', statement)
+
+class RequestStats:
+    """SQL and template timings collected for one request."""
+
+    def __init__(self, slow_query_count):
+        self.started = perf_counter()
+        self.query_count = 0
+        self.query_time = 0.0
+        self.template_time = 0.0
+        self.slowest = []
+        self._slow_query_count = slow_query_count
+
+    def add_query(self, statement, duration):
+        self.query_count += 1
+        self.query_time += duration
+        if len(self.slowest) < self._slow_query_count or duration > self.slowest[-1][0]:
+            self.slowest.append((duration, statement))
+            self.slowest.sort(key=lambda item: item[0], reverse=True)
+            del self.slowest[self._slow_query_count:]
+
+def _current_stats():
+    if not has_app_context():
+        return None
+    return g.get('_request_stats')
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats() is not None:
+        conn.info.setdefault('query_start', []).append(perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats()
+    if stats is None or not conn.info.get('query_start'):
+        return
+    stats.add_query(statement, perf_counter() - conn.info['query_start'].pop())
+
+def _before_render_template(sender, template, context, **extra):
+    stats = _current_stats()
+    if stats is not None:
+        g._template_start = perf_counter()
+
+def _template_rendered(sender, template, context, **extra):
+    stats = _current_stats()
+    start = g.pop('_template_start', None)
+    if stats is not None and start is not None:
+        stats.template_time += perf_counter() - start
+
+class SQLInstrumentation:
+    """Per-request SQL statement counts and timings.
+
+    Enabled with SQL_INSTRUMENTATION. When disabled no hooks are registered at all.
+    Responses carry a Server-Timing header (db, tpl, app) and X-Query-Count;
+    requests slower than SLOW_REQUEST_THRESHOLD seconds are logged as JSON with
+    their SLOW_QUERY_LOG_COUNT slowest normalized statements.
+    """
+
+    _engine_hooks_installed = False
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SQL_INSTRUMENTATION', False)
+        app.config.setdefault('SLOW_REQUEST_THRESHOLD', 0.5)
+        app.config.setdefault('SLOW_QUERY_LOG_COUNT', 5)
+        if not app.config['SQL_INSTRUMENTATION']:
+            return
+
+        if not SQLInstrumentation._engine_hooks_installed:
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            SQLInstrumentation._engine_hooks_installed = True
+        before_render_template.connect(_before_render_template, app)
+        template_rendered.connect(_template_rendered, app)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    def _start_request(self):
+        g._request_stats = RequestStats(self._config('SLOW_QUERY_LOG_COUNT'))
+
+    def _finish_request(self, response):
+        stats = g.pop('_request_stats', None)
+        if stats is None:
+            return response
+        total = perf_counter() - stats.started
+        response.headers['Server-Timing'] = ', '.join([
+            f'db;dur={stats.query_time * 1000:.1f};desc="{stats.query_count} queries"',
+            f'tpl;dur={stats.template_time * 1000:.1f}',
+            f'app;dur={total * 1000:.1f}',
+        ])
+        response.headers['X-Query-Count'] = str(stats.query_count)
+
+        if total >= self._config('SLOW_REQUEST_THRESHOLD'):
+            current_app.logger.warning('slow request %s', json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 1),
+                'db_ms': round(stats.query_time * 1000, 1),
+                'template_ms': round(stats.template_time * 1000, 1),
+                'query_count': stats.query_count,
+                'slowest_queries': [
+                    {'ms': round(duration * 1000, 1), 'sql': normalize_sql(statement)}
+                    for duration, statement in stats.slowest
+                ],
+            }))
+        return response
+
+    @staticmethod
+    def _config(key):
+        return current_app.config[key]
@@ -0,0 +1,126 @@
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from itertools import groupby
+from flask import current_app
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app import db
+from app.models import Job
+
+# Queue settings, each can be overridden by the config key of the same name
+DEFAULTS = {
+    'JOB_MAX_ATTEMPTS': 5,
+    'JOB_RETRY_DELAY': 30,  # seconds before the first retry, doubled for every further one
+    'JOB_LOCK_TIMEOUT': 600,  # seconds after which a running job of a dead worker is retried
+}
+
+# Job kind -> handler(jobs) returning {job id: error} of the jobs that failed
+JOB_HANDLERS = {}
+
+def _setting(name):
+    return current_app.config.get(name, DEFAULTS[name])
+
+def job_handler(kind):
+    """Register the handler of a job kind; it gets all claimed jobs of that kind at once."""
+    def decorator(f):
+        JOB_HANDLERS[kind] = f
+        return f
+    return decorator
+
+def _insert_jobs(rows):
+    """Insert job rows, skipping those whose idempotency key already exists."""
+    dialect = db.session.get_bind(clause=insert(Job.__table__)).dialect.name
+    if dialect == 'postgresql':
+        stmt = postgresql_insert(Job.__table__).on_conflict_do_nothing(index_elements=['idempotency_key'])
+    elif dialect == 'sqlite':
+        stmt = sqlite_insert(Job.__table__).on_conflict_do_nothing(index_elements=['idempotency_key'])
+    else:
+        keys = [row['idempotency_key'] for row in rows if row['idempotency_key']]
+        existing = set(db.session.scalars(select(Job.idempotency_key).where(Job.idempotency_key.in_(keys))))
+        rows = [row for row in rows if row['idempotency_key'] not in existing]
+        stmt = insert(Job.__table__)
+    if not rows:
+        return 0
+    return db.session.execute(stmt, rows).rowcount
+
+def enqueue(kind, payload, key=None, delay=None):
+    """Add a job to the current transaction; returns False if `key` was already queued."""
+    return enqueue_many(kind, [(key, payload)], delay) == 1
+
+def enqueue_many(kind, jobs, delay=None):
+    """Add (key, payload) jobs of one kind in a single statement; returns the number queued."""
+    now = datetime.utcnow()
+    run_at = now + delay if delay else now
+    rows = [{'kind': kind, 'payload': payload, 'idempotency_key': key, 'status': 'queued',
+             'attempts': 0, 'run_at': run_at, 'created_at': now}
+            for key, payload in jobs]
+    return _insert_jobs(rows) if rows else 0
+
+def _release_stale_jobs(now):
+    """Requeue running jobs whose worker stopped without finishing them."""
+    db.session.execute(
+        update(Job).where(
+            Job.status == 'running',
+            Job.locked_at < now - timedelta(seconds=_setting('JOB_LOCK_TIMEOUT'))
+        ).values(status='queued', locked_by=None, locked_at=None),
+        execution_options={'synchronize_session': False}
+    )
+
+def claim_jobs(worker_id, limit):
+    """Atomically mark up to `limit` due jobs as running for this worker and return them.
+
+    The UPDATE re-checks status = 'queued', so concurrent workers never claim
+    the same job.
+    """
+    now = datetime.utcnow()
+    claim = f'{worker_id}/{uuid.uuid4().hex[:8]}'
+    _release_stale_jobs(now)
+    due = select(Job.id).where(Job.status == 'queued', Job.run_at <= now).order_by(Job.run_at).limit(limit)
+    db.session.execute(
+        update(Job).where(Job.id.in_(due), Job.status == 'queued')
+        .values(status='running', locked_by=claim, locked_at=now, attempts=Job.attempts + 1),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+    return db.session.scalars(
+        select(Job).where(Job.status == 'running', Job.locked_by == claim)
+        .order_by(Job.run_at, Job.id)
+    ).all()
+
+def _finish(job, error, now):
+    job.locked_by = job.locked_at = None
+    if error is None:
+        job.status, job.finished_at, job.last_error = 'done', now, None
+    elif job.attempts >= _setting('JOB_MAX_ATTEMPTS'):
+        job.status, job.finished_at, job.last_error = 'failed', now, error
+    else:
+        job.status, job.last_error = 'queued', error
+        job.run_at = now + timedelta(seconds=_setting('JOB_RETRY_DELAY') * 2 ** (job.attempts - 1))
+
+def run_jobs(worker_id, batch_size=50):
+    """Claim one batch of due jobs and run it, one handler call per job kind.
+
+    Each kind is committed on its own, so a failing handler does not undo the
+    jobs, or the follow-up jobs, of the others. Returns the number of jobs run.
+    """
+    jobs = claim_jobs(worker_id, batch_size)
+    for kind, group in groupby(sorted(jobs, key=lambda job: job.kind), key=lambda job: job.kind):
+        group = list(group)
+        ids = [job.id for job in group]
+        handler = JOB_HANDLERS.get(kind)
+        try:
+            if handler is None:
+                raise LookupError(f'No handler for job kind {kind!r}')
+            failures = {job_id: repr(error) for job_id, error in (handler(group) or {}).items()}
+        except Exception:
+            db.session.rollback()
+            error = traceback.format_exc()
+            failures = dict.fromkeys(ids, error)
+            current_app.logger.exception('Job batch %s failed', kind)
+        now = datetime.utcnow()
+        for job in db.session.scalars(select(Job).where(Job.id.in_(ids))):
+            _finish(job, failures.get(job.id), now)
+        db.session.commit()
+    return len(jobs)
@@ -0,0 +1,193 @@
+import asyncio
+import os
+import re
+import smtplib
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from email.message import EmailMessage
+from flask import current_app
+
+# Mail settings, each can be overridden by the config key of the same name
+DEFAULTS = {
+    'MAIL_BACKEND': 'smtp',  # smtp, or file to write .eml files for offline testing
+    'MAIL_SERVER': 'localhost',
+    'MAIL_PORT': 25,
+    'MAIL_USE_TLS': False,
+    'MAIL_USERNAME': None,
+    'MAIL_PASSWORD': None,
+    'MAIL_DEFAULT_SENDER': 'noreply@localhost',
+    'MAIL_FILE_SINK_DIR': None,  # defaults to <instance>/mail
+    'MAIL_BASE_URL': 'http://localhost:5000',  # links in mails built outside a request
+    'MAIL_POOL_SIZE': 4,  # persistent SMTP connections used in parallel
+    'MAIL_RATE_LIMIT': 0,  # messages per minute over all batches of this process, 0 = no limit
+}
+
+# Errors that concern one message; the connection stays usable
+_REFUSED = (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError, smtplib.SMTPSenderRefused)
+
+_FIELD = re.compile(r'\x00([\w.]+)\x00')
+
+def mail_setting(name):
+    return current_app.config.get(name, DEFAULTS[name])
+
+def build_message(to, subject, body):
+    message = EmailMessage()
+    message['From'] = mail_setting('MAIL_DEFAULT_SENDER')
+    message['To'] = to
+    message['Subject'] = subject
+    message.set_content(body)
+    return message
+
+class RecipientField:
+    """Stands in for a per-recipient value while a batch template is rendered.
+
+    It renders as a marker that render_batch() replaces for every recipient, so
+    the template itself runs once per batch.
+    """
+
+    def __init__(self, path):
+        self._path = path
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return RecipientField(f'{self._path}.{name}')
+
+    __getitem__ = __getattr__
+
+    def __str__(self):
+        return f'\x00{self._path}\x00'
+
+def _resolve(context, path):
+    name, *attributes = path.split('.')
+    value = context[name]
+    for attribute in attributes:
+        value = value[attribute] if isinstance(value, dict) else getattr(value, attribute)
+    return '' if value is None else str(value)
+
+def render_batch(template_name, recipients, recipient_names, **shared):
+    """Render a template once and fill in each recipient's values.
+
+    `recipients` is a list of dicts holding the `recipient_names` variables
+    (e.g. player, links); `shared` holds the variables common to the batch.
+    Returns one body per recipient. Recipient variables can only be printed,
+    not used in conditions or filters.
+    """
+    template = current_app.jinja_env.get_template(template_name)
+    context = {}
+    current_app.update_template_context(context)
+    context.update(shared)
+    context.update({name: RecipientField(name) for name in recipient_names})
+    text = template.render(context)
+    return [_FIELD.sub(lambda match: _resolve(recipient, match.group(1)), text)
+            for recipient in recipients]
+
+class RateLimiter:
+    """Allows at most `per_minute` sends in any 60 second window.
+
+    The send times live at module level, so the limit also holds across the
+    batches of a long-running worker.
+    """
+    _sent = deque()
+    _lock = threading.Lock()
+
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+
+    def _reserve(self):
+        """Record a send and return 0, or return the seconds to wait first."""
+        with self._lock:
+            now = time.monotonic()
+            while self._sent and self._sent[0] <= now - 60:
+                self._sent.popleft()
+            if len(self._sent) < self.per_minute:
+                self._sent.append(now)
+                return 0
+            return self._sent[0] + 60 - now
+
+    async def wait(self):
+        if not self.per_minute:
+            return
+        while True:
+            delay = self._reserve()
+            if not delay:
+                return
+            await asyncio.sleep(delay)
+
+def _connect(settings):
+    server = smtplib.SMTP(settings['MAIL_SERVER'], settings['MAIL_PORT'], timeout=30)
+    if settings['MAIL_USE_TLS']:
+        server.starttls()
+    if settings['MAIL_USERNAME']:
+        server.login(settings['MAIL_USERNAME'], settings['MAIL_PASSWORD'])
+    return server
+
+def _disconnect(server):
+    try:
+        server.quit()
+    except smtplib.SMTPException:
+        server.close()
+
+async def _deliver(messages, settings):
+    """Send messages over a pool of persistent connections, returns {index: error}."""
+    queue = asyncio.Queue()
+    for item in enumerate(messages):
+        queue.put_nowait(item)
+    limiter = RateLimiter(settings['MAIL_RATE_LIMIT'])
+    failures = {}
+
+    async def sender():
+        server = None
+        try:
+            while not queue.empty():
+                index, message = queue.get_nowait()
+                await limiter.wait()
+                try:
+                    if server is None:
+                        server = await asyncio.to_thread(_connect, settings)
+                    await asyncio.to_thread(server.send_message, message)
+                except _REFUSED as e:
+                    failures[index] = e
+                except (smtplib.SMTPException, OSError) as e:
+                    # Broken connection: this message is retried with its job,
+                    # the next one opens a new connection
+                    failures[index] = e
+                    if server is not None:
+                        server.close()
+                    server = None
+        finally:
+            if server is not None:
+                await asyncio.to_thread(_disconnect, server)
+
+    pool_size = max(1, min(settings['MAIL_POOL_SIZE'], len(messages)))
+    await asyncio.gather(*[sender() for _ in range(pool_size)])
+    return failures
+
+def _send_smtp(messages):
+    settings = {name: mail_setting(name) for name in DEFAULTS}
+    return asyncio.run(_deliver(messages, settings))
+
+def _write_files(messages):
+    directory = mail_setting('MAIL_FILE_SINK_DIR') or os.path.join(current_app.instance_path, 'mail')
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.utcnow().strftime('%Y%m%d%H%M%S%f')
+    for index, message in enumerate(messages):
+        with open(os.path.join(directory, f'{stamp}-{index:04d}.eml'), 'wb') as f:
+            f.write(message.as_bytes())
+    return {}
+
+def send_messages(messages):
+    """Send a batch of messages over the SMTP connection pool.
+
+    Returns {index: error} of the messages that could not be sent.
+    """
+    if not messages:
+        return {}
+    backend = mail_setting('MAIL_BACKEND')
+    if backend == 'file':
+        return _write_files(messages)
+    if backend == 'smtp':
+        return _send_smtp(messages)
+    raise ValueError(f'Unknown MAIL_BACKEND {backend!r}')
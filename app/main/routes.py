@@ -1,118 +1,249 @@
-from flask import render_template, request, current_app
+from calendar import monthrange
+from flask import render_template, redirect, request, current_app, jsonify, url_for, abort, Response, \
+    stream_with_context
+from app import cache, db
+from app.conditional import conditional
+from app.ics import generate_ics
 from app.main import main
-from app.models import Event, Player, News, ClothingRule, Invite
+from app.pagination import paginate_request
+from app.recurrence import Occurrence, by_start, event_url, excluded_dates, find_occurrence, \
+    occurrences_between, parse_day, series_query, upcoming_occurrences
+from app.rsvp import load_rsvp_token, set_invite_status, waitlist_rank
+from app.search import search as search_index
+from app.models import Event, EventSeries, Player, News, ClothingRule, Invite, PlayerAttendanceStats
 from datetime import datetime, date
-from sqlalchemy import and_
+from itertools import islice
+from sqlalchemy import and_, select
+
+# Occurrences of a series have no id, templates link them through event_url()
+main.add_app_template_global(event_url)
+
+# Queries shared by the views and their conditional GET validators
+def _upcoming_events_query():
+    return Event.query.filter(
+        Event.date >= date.today()
+    ).order_by(Event.date, Event.time)
+
+def _published_news_query():
+    return News.query.filter_by(published=True).order_by(
+        News.created_at.desc()
+    )
+
+def _calendar_args():
+    event_type = request.args.get('type', 'all')
+    month = request.args.get('month', datetime.now().month, type=int)
+    year = request.args.get('year', datetime.now().year, type=int)
+    return event_type, month, year
+
+def _month_range(month, year):
+    start_date = date(year, month, 1)
+    if month == 12:
+        end_date = date(year + 1, 1, 1)
+    else:
+        end_date = date(year, month + 1, 1)
+    return start_date, end_date
+
+def _calendar_query(event_type, month, year):
+    query = Event.query
+    
+    if event_type != 'all':
+        query = query.filter_by(event_type=event_type)
+    
+    # Filter by month and year
+    start_date, end_date = _month_range(month, year)
+    
+    return query.filter(
+        and_(Event.date >= start_date, Event.date < end_date)
+    ).order_by(Event.date, Event.time)
+
+def _calendar_series_query(event_type, month, year):
+    return series_query(*_month_range(month, year), event_type)
+
+def _calendar_days(event_type, month, year):
+    """Events of a month as light rows, bucketed per day in one pass.
+    
+    Only the columns the grid shows are selected; the RSVP counts come from the
+    denormalized counters on the same row. Series occurrences without a row of
+    their own are expanded for the month and merged in.
+    """
+    rows = _calendar_query(event_type, month, year).with_entities(
+        Event.id, Event.title, Event.event_type, Event.date, Event.time,
+        Event.location, Event.max_participants,
+        Event.confirmed_count, Event.declined_count, Event.pending_count
+    ).all()
+    
+    occurrences = occurrences_between(*_month_range(month, year), event_type)
+    
+    days = {date(year, month, day): [] for day in range(1, monthrange(year, month)[1] + 1)}
+    for row in by_start(rows, occurrences):
+        days[row.date].append(row)
+    return days
+
+def _players_query(team_filter):
+    query = Player.query.filter_by(active=True)
+    
+    if team_filter != 'all':
+        query = query.filter_by(team=team_filter)
+    
+    return query.order_by(Player.last_name, Player.first_name)
 
 @main.route('/')
 @main.route('/index')
+@conditional(lambda: [_upcoming_events_query(), series_query(date.today()), _published_news_query()])
+@cache.cached(Event, EventSeries, Invite, News)
 def index():
     """Home page with upcoming events and latest news."""
-    # Get upcoming events
-    upcoming_events = Event.query.filter(
-        Event.date >= date.today()
-    ).order_by(Event.date, Event.time).limit(5).all()
+    # Get upcoming events, the next five of the rows and the series occurrences
+    upcoming_events = list(islice(by_start(
+        _upcoming_events_query().limit(5).all(), upcoming_occurrences(date.today(), 5)
+    ), 5))
     
     # Get latest news
-    latest_news = News.query.filter_by(published=True).order_by(
-        News.created_at.desc()
-    ).limit(3).all()
+    latest_news = _published_news_query().limit(3).all()
     
     return render_template('index.html', 
                          events=upcoming_events, 
                          news=latest_news)
 
 @main.route('/calendar')
+@conditional(lambda: [_calendar_query(*_calendar_args()), _calendar_series_query(*_calendar_args())])
+@cache.cached(Event, EventSeries, Invite)
 def calendar():
     """Calendar view of all events."""
     # Get filter parameters
-    event_type = request.args.get('type', 'all')
-    month = request.args.get('month', datetime.now().month, type=int)
-    year = request.args.get('year', datetime.now().year, type=int)
-    
-    # Build query
-    query = Event.query
-    
-    if event_type != 'all':
-        query = query.filter_by(event_type=event_type)
-    
-    # Filter by month and year
-    start_date = date(year, month, 1)
-    if month == 12:
-        end_date = date(year + 1, 1, 1)
-    else:
-        end_date = date(year, month + 1, 1)
-    
-    query = query.filter(
-        and_(Event.date >= start_date, Event.date < end_date)
-    )
+    event_type, month, year = _calendar_args()
     
-    events = query.order_by(Event.date, Event.time).all()
+    days = _calendar_days(event_type, month, year)
+    events = [event for day_events in days.values() for event in day_events]
     
     return render_template('calendar.html', 
                          events=events,
+                         days=days,
                          current_month=month,
                          current_year=year,
                          event_type=event_type)
 
+@main.route('/calendar.json')
+@conditional(lambda: [_calendar_query(*_calendar_args()), _calendar_series_query(*_calendar_args())])
+def calendar_json():
+    """Month view data of the calendar for the frontend."""
+    event_type, month, year = _calendar_args()
+    days = _calendar_days(event_type, month, year)
+    
+    return jsonify({
+        'year': year,
+        'month': month,
+        'event_type': event_type,
+        'days': [
+            {
+                'date': day.isoformat(),
+                'events': [
+                    {
+                        'id': event.id,
+                        'title': event.title,
+                        'event_type': event.event_type,
+                        'time': event.time.strftime('%H:%M'),
+                        'location': event.location,
+                        'max_participants': event.max_participants,
+                        'confirmed': event.confirmed_count,
+                        'declined': event.declined_count,
+                        'pending': event.pending_count,
+                        'url': event_url(event),
+                    }
+                    for event in day_events
+                ],
+            }
+            for day, day_events in days.items()
+        ],
+    })
+
 @main.route('/event/<int:id>')
+@conditional(lambda id: [
+    Event.query.filter_by(id=id),
+    Player.query.join(Invite).filter(Invite.event_id == id),
+    ClothingRule.query
+])
 def event_detail(id):
     """Event detail page."""
     event = Event.query.get_or_404(id)
     
     # Get invitations with player details
-    invites = Invite.query.filter_by(event_id=id).join(Player).all()
+    invites = Invite.for_event(id).order_by(Player.last_name, Player.first_name).all()
     
     # Get clothing rules for this event type
-    clothing_rule = ClothingRule.query.filter_by(event_type=event.event_type).first()
+    clothing_rule = ClothingRule.cached_rules().get(event.event_type)
     
     return render_template('event_detail.html', 
                          event=event, 
                          invites=invites,
                          clothing_rule=clothing_rule)
 
+@main.route('/series/<int:id>/<day>')
+@conditional(lambda id, day: [
+    EventSeries.query.filter_by(id=id),
+    # Materializing the occurrence turns this page into a redirect to the event
+    Event.query.filter_by(series_id=id, occurrence_date=parse_day(day)),
+    ClothingRule.query
+])
+def occurrence_detail(id, day):
+    """Detail page of a series occurrence that has no event row yet."""
+    series = EventSeries.query.get_or_404(id)
+    occurrence = find_occurrence(series, parse_day(day))
+    if occurrence is None:
+        abort(404)
+    if not isinstance(occurrence, Occurrence):
+        return redirect(url_for('main.event_detail', id=occurrence.id))
+    
+    clothing_rule = ClothingRule.cached_rules().get(occurrence.event_type)
+    
+    return render_template('event_detail.html', 
+                         event=occurrence, 
+                         invites=[],
+                         clothing_rule=clothing_rule)
+
 @main.route('/players')
+@conditional(lambda: [_players_query(request.args.get('team', 'all'))])
 def players():
     """Public player list."""
     team_filter = request.args.get('team', 'all')
     
-    query = Player.query.filter_by(active=True)
-    
-    if team_filter != 'all':
-        query = query.filter_by(team=team_filter)
-    
-    players = query.order_by(Player.last_name, Player.first_name).all()
+    players = _players_query(team_filter).all()
     
     return render_template('players.html', 
                          players=players,
                          team_filter=team_filter)
 
 @main.route('/player/<int:id>')
+@conditional(lambda id: [
+    Player.query.filter_by(id=id),
+    Event.query.join(Invite).filter(Invite.player_id == id, Event.date >= date.today()),
+    PlayerAttendanceStats.query.filter_by(player_id=id)
+])
 def player_detail(id):
     """Player detail page."""
     player = Player.query.get_or_404(id)
     
     # Get player's upcoming events
-    upcoming_invites = Invite.query.join(Event).filter(
-        Invite.player_id == id,
+    upcoming_invites = Invite.for_player(id).filter(
         Event.date >= date.today()
     ).order_by(Event.date, Event.time).all()
     
+    attendance_stats = player.attendance_stats.order_by(
+        PlayerAttendanceStats.season.desc(), PlayerAttendanceStats.event_type
+    ).all()
+    
     return render_template('player_detail.html', 
                          player=player,
-                         upcoming_invites=upcoming_invites)
+                         upcoming_invites=upcoming_invites,
+                         attendance_stats=attendance_stats)
 
 @main.route('/news')
+@conditional(lambda: [_published_news_query()])
+@cache.cached(News)
 def news():
     """News page with pagination."""
-    page = request.args.get('page', 1, type=int)
-    
-    pagination = News.query.filter_by(published=True).order_by(
-        News.created_at.desc()
-    ).paginate(
-        page=page,
-        per_page=current_app.config['ITEMS_PER_PAGE'],
-        error_out=False
+    pagination = paginate_request(
+        _published_news_query(), [News.created_at, News.id], descending=True
     )
     
     news_items = pagination.items
@@ -122,6 +253,7 @@ def news():
                          pagination=pagination)
 
 @main.route('/news/<int:id>')
+@conditional(lambda id: [News.query.filter_by(id=id), _published_news_query()])
 def news_detail(id):
     """News detail page."""
     news_item = News.query.get_or_404(id)
@@ -137,11 +269,113 @@ def news_detail(id):
                          related_news=related_news)
 
 @main.route('/clothing-rules')
+@conditional(lambda: [ClothingRule.query])
+@cache.cached(ClothingRule)
 def clothing_rules():
     """Display clothing rules for different event types."""
-    rules = ClothingRule.query.all()
+    rules = list(ClothingRule.cached_rules().values())
     return render_template('clothing_rules.html', rules=rules)
 
+# iCalendar feeds
+ICS_COLUMNS = (Event.id, Event.title, Event.description, Event.location,
+               Event.event_type, Event.date, Event.time, Event.updated_at)
+
+def _ics_response(stmt, name, filename, series=None):
+    """Stream an iCalendar feed, fetching the rows through a server-side cursor.
+    
+    `series` is a query of event series, sent as one recurring VEVENT each.
+    """
+    def rows():
+        yield from db.session.execute(
+            stmt.order_by(Event.date, Event.time).execution_options(yield_per=500)
+        )
+    
+    def recurring():
+        items = series.all()
+        excluded = excluded_dates(items)
+        for item in items:
+            yield item, excluded.get(item.id, [])
+    
+    response = Response(
+        stream_with_context(generate_ics(rows(), name, request.host,
+                                         recurring() if series is not None else ())),
+        mimetype='text/calendar'
+    )
+    response.headers['Content-Disposition'] = f'inline; filename="{filename}.ics"'
+    return response
+
+def _team_events(team):
+    return Event.invites.any(Invite.player.has(Player.team == team))
+
+@main.route('/calendar.ics')
+@conditional(lambda: [Event.query, EventSeries.query])
+def calendar_feed():
+    """Club-wide calendar feed."""
+    return _ics_response(select(*ICS_COLUMNS), current_app.config['CLUB_NAME'], 'verein',
+                         series=EventSeries.query.order_by(EventSeries.id))
+
+@main.route('/calendar/team/<team>.ics')
+@conditional(lambda team: [Event.query.filter(_team_events(team))])
+def team_calendar_feed(team):
+    """Calendar feed of all events a team is invited to."""
+    return _ics_response(
+        select(*ICS_COLUMNS).where(_team_events(team)),
+        f"{current_app.config['CLUB_NAME']} – {team}", team
+    )
+
+@main.route('/calendar/type/<event_type>.ics')
+@conditional(lambda event_type: [Event.query.filter_by(event_type=event_type),
+                                 EventSeries.query.filter_by(event_type=event_type)])
+def event_type_calendar_feed(event_type):
+    """Calendar feed of one event type."""
+    return _ics_response(
+        select(*ICS_COLUMNS).where(Event.event_type == event_type),
+        f"{current_app.config['CLUB_NAME']} – {event_type.title()}", event_type,
+        series=EventSeries.query.filter_by(event_type=event_type).order_by(EventSeries.id)
+    )
+
+@main.route('/player/<int:id>/calendar.ics')
+@conditional(lambda id: [Event.query.join(Invite).filter(Invite.player_id == id)])
+def player_calendar_feed(id):
+    """Personal calendar feed with the events a player is invited to and has not declined."""
+    player = Player.query.get_or_404(id)
+    return _ics_response(
+        select(*ICS_COLUMNS, Invite.status).join(Invite).where(
+            Invite.player_id == id,
+            Invite.status != 'declined'
+        ),
+        f"{current_app.config['CLUB_NAME']} – {player.full_name}", f'spieler-{id}'
+    )
+
+@main.route('/search')
+def search():
+    """Search published news, events and active players."""
+    query = request.args.get('q', '').strip()
+    results = search_index(query) if query else None
+    return render_template('search.html', query=query, results=results,
+                         search_endpoint='main.search')
+
+@main.route('/rsvp/<token>', methods=['GET', 'POST'])
+def rsvp(token):
+    """Answer an invite from a signed link; GET only asks, so link scanners change nothing."""
+    payload = load_rsvp_token(token)
+    if payload is None:
+        abort(404)
+    invite_id, player_id, event_id, status = payload
+    result = None
+    if request.method == 'POST':
+        result = set_invite_status(invite_id, player_id, event_id, status)
+        if result is None:
+            abort(404)
+        db.session.commit()
+    invite = Invite.query.filter_by(id=invite_id, player_id=player_id, event_id=event_id).first_or_404()
+    rank = waitlist_rank(invite) if invite.status == 'waitlisted' else None
+    return render_template('rsvp.html',
+                         invite=invite,
+                         status=status,
+                         result=result,
+                         waitlist_rank=rank)
+
 @main.route('/about')
 def about():
     """About page."""
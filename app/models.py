@@ -1,6 +1,11 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+from flask import g
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
+from sqlalchemy import event, func, insert, literal, select, true, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import contains_eager
 from app import db, login_manager
 
 class User(UserMixin, db.Model):
@@ -35,23 +40,157 @@ class Event(db.Model):
     location = db.Column(db.String(200))
     max_participants = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
     
+    # Set on the materialized occurrences of an EventSeries; occurrence_date is the
+    # date the series rule gave the event and stays when the event is moved
+    series_id = db.Column(db.Integer, db.ForeignKey('event_series.id'))
+    occurrence_date = db.Column(db.Date)
+    
+    # Denormalized RSVP counters, maintained by the Invite mapper events below
+    confirmed_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    declined_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    pending_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    waitlisted_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     # Relationships
-    invites = db.relationship('Invite', backref='event', lazy='dynamic', cascade='all, delete-orphan')
+    # Invite.event/Invite.player stay lazy so single lookups stay cheap; list views
+    # must load invites through the Invite.for_event()/for_player() helpers, which
+    # join and populate the related row in the same statement.
+    invites = db.relationship('Invite', backref=db.backref('event', lazy='select'),
+                              lazy='dynamic', cascade='all, delete-orphan')
+    
+    # Indexes for the upcoming/calendar filters sorted by date and time
+    __table_args__ = (
+        db.Index('ix_event_date_time', 'date', 'time'),
+        db.Index('ix_event_type_date_time', 'event_type', 'date', 'time'),
+        db.UniqueConstraint('series_id', 'occurrence_date'),
+    )
+    
+    @classmethod
+    def refresh_invite_counts(cls, event_ids=None):
+        """Recompute the RSVP counters from the invite table in one UPDATE."""
+        values = {}
+        for status, column in INVITE_STATUS_COUNTERS.items():
+            values[column] = select(func.count(Invite.id)).where(
+                Invite.event_id == cls.id,
+                Invite.status == status
+            ).scalar_subquery()
+        stmt = update(cls).values(values)
+        if event_ids is not None:
+            stmt = stmt.where(cls.id.in_(event_ids))
+        return db.session.execute(stmt, execution_options={'synchronize_session': False}).rowcount
     
     def get_confirmed_count(self):
-        return self.invites.filter_by(status='confirmed').count()
+        return self.confirmed_count
     
     def get_declined_count(self):
-        return self.invites.filter_by(status='declined').count()
+        return self.declined_count
     
     def get_pending_count(self):
-        return self.invites.filter_by(status='pending').count()
+        return self.pending_count
+    
+    def get_waitlisted_count(self):
+        return self.waitlisted_count
+    
+    @property
+    def is_full(self):
+        return self.max_participants is not None and self.confirmed_count >= self.max_participants
     
     def __repr__(self):
         return f'<Event {self.title}>'
 
+# RRULE BYDAY codes in the order of date.weekday()
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+# Columns an occurrence takes over from its series
+SERIES_EVENT_FIELDS = ('title', 'description', 'event_type', 'time', 'location', 'max_participants')
+
+class EventSeries(db.Model):
+    """Recurring event, e.g. the weekly training of a team.
+    
+    The dates follow an RRULE-style rule (FREQ, INTERVAL, BYDAY, UNTIL) and are
+    expanded for the window a view asks for. Only occurrences that need a row of
+    their own, because they have invites or were edited, exist as Event with
+    series_id set; cancelled dates are kept in EventSeriesCancellation.
+    """
+    __tablename__ = 'event_series'
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.Text)
+    event_type = db.Column(db.String(20), nullable=False)
+    time = db.Column(db.Time, nullable=False)
+    location = db.Column(db.String(200))
+    max_participants = db.Column(db.Integer)
+    frequency = db.Column(db.String(10), nullable=False, default='weekly')  # weekly, daily
+    interval = db.Column(db.Integer, nullable=False, default=1)
+    weekdays = db.Column(db.String(20))  # BYDAY codes, e.g. MO,TH; empty = weekday of start_date
+    start_date = db.Column(db.Date, nullable=False)
+    until = db.Column(db.Date)  # last possible date, open-ended if empty
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    
+    # Relationships
+    events = db.relationship('Event', backref='series', lazy='dynamic')
+    cancellations = db.relationship('EventSeriesCancellation', lazy='dynamic',
+                                    cascade='all, delete-orphan')
+    
+    # Index for the "series overlapping a date window" filter
+    __table_args__ = (
+        db.Index('ix_event_series_dates', 'start_date', 'until'),
+    )
+    
+    @property
+    def weekday_numbers(self):
+        codes = [code for code in (self.weekdays or '').split(',') if code in WEEKDAYS]
+        return sorted({WEEKDAYS.index(code) for code in codes}) or [self.start_date.weekday()]
+    
+    def dates(self, start, end=None):
+        """Yield the dates of the rule from `start` on, before `end` if given.
+        
+        Without `end` and `until` the generator is endless; callers slice it.
+        """
+        first = max(start, self.start_date)
+        if self.frequency == 'daily':
+            steps = -(-(first - self.start_date).days // self.interval)
+            day = self.start_date + timedelta(days=steps * self.interval)
+            while (end is None or day < end) and (self.until is None or day <= self.until):
+                yield day
+                day += timedelta(days=self.interval)
+            return
+        # Weekly: every `interval`-th week counted from the week of start_date
+        week_start = self.start_date - timedelta(days=self.start_date.weekday())
+        week = (first - week_start).days // 7 // self.interval * self.interval
+        while True:
+            for weekday in self.weekday_numbers:
+                day = week_start + timedelta(days=week * 7 + weekday)
+                if (end is not None and day >= end) or (self.until is not None and day > self.until):
+                    return
+                if day >= first:
+                    yield day
+            week += self.interval
+    
+    @property
+    def rrule(self):
+        """The rule as iCalendar RRULE value."""
+        parts = [f'FREQ={self.frequency.upper()}', f'INTERVAL={self.interval}']
+        if self.frequency == 'weekly':
+            parts.append('BYDAY=' + ','.join(WEEKDAYS[day] for day in self.weekday_numbers))
+        if self.until:
+            parts.append(f"UNTIL={self.until.strftime('%Y%m%d')}T235959")
+        return ';'.join(parts)
+    
+    def __repr__(self):
+        return f'<EventSeries {self.title}>'
+
+class EventSeriesCancellation(db.Model):
+    """A date on which an event series does not take place."""
+    __tablename__ = 'event_series_cancellation'
+    series_id = db.Column(db.Integer, db.ForeignKey('event_series.id'), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+
 class Player(db.Model):
     """Player model."""
     id = db.Column(db.Integer, primary_key=True)
@@ -65,9 +204,28 @@ class Player(db.Model):
     team = db.Column(db.String(50))  # A-Team, B-Team, Youth, etc.
     active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
-    invites = db.relationship('Invite', backref='player', lazy='dynamic', cascade='all, delete-orphan')
+    invites = db.relationship('Invite', backref=db.backref('player', lazy='select'),
+                              lazy='dynamic', cascade='all, delete-orphan')
+    
+    # Indexes for the public (active) and admin player lists sorted by name
+    __table_args__ = (
+        db.Index('ix_player_active_name', 'active', 'last_name', 'first_name'),
+        db.Index('ix_player_active_team_name', 'active', 'team', 'last_name', 'first_name'),
+        db.Index('ix_player_team_name', 'team', 'last_name', 'first_name'),
+        db.Index('ix_player_name', 'last_name', 'first_name'),
+    )
+    
+    @classmethod
+    def not_invited_to(cls, event_id):
+        """Query active players without an invite for the event, as a NOT EXISTS anti-join."""
+        invited = select(Invite.id).where(
+            Invite.event_id == event_id,
+            Invite.player_id == cls.id
+        )
+        return cls.query.filter(cls.active == True, ~invited.exists())
     
     @property
     def full_name(self):
@@ -79,19 +237,275 @@ class Player(db.Model):
 class Invite(db.Model):
     """Invitation model - links players to events."""
     id = db.Column(db.Integer, primary_key=True)
-    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
-    player_id = db.Column(db.Integer, db.ForeignKey('player.id'), nullable=False)
-    status = db.Column(db.String(20), default='pending')  # pending, confirmed, declined
+    # active_history loads the previous value on change, the counter events need it
+    event_id = db.column_property(
+        db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False), active_history=True
+    )
+    player_id = db.column_property(
+        db.Column(db.Integer, db.ForeignKey('player.id'), nullable=False), active_history=True
+    )
+    status = db.column_property(
+        db.Column(db.String(20), default='pending'), active_history=True
+    )  # pending, confirmed, declined, waitlisted
+    # Order on the waitlist of a full event, only set while status is waitlisted
+    waitlist_position = db.Column(db.Integer)
     response_date = db.Column(db.DateTime)
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Unique constraint to prevent duplicate invites
-    __table_args__ = (db.UniqueConstraint('event_id', 'player_id'),)
+    # Unique constraint to prevent duplicate invites, it also serves lookups by event_id
+    __table_args__ = (
+        db.UniqueConstraint('event_id', 'player_id'),
+        # Also serves the waitlist promotion: event_id, status = 'waitlisted' ORDER BY position
+        db.Index('ix_invite_event_status', 'event_id', 'status', 'waitlist_position'),
+        db.Index('ix_invite_player_status', 'player_id', 'status'),
+        # Ids are never reused: job idempotency keys and RSVP links name invites by id
+        {'sqlite_autoincrement': True},
+    )
+    
+    @classmethod
+    def for_event(cls, event_id):
+        """Query the invites of an event with invite.player loaded by the same join."""
+        return cls.query.filter(cls.event_id == event_id).join(cls.player).options(
+            contains_eager(cls.player)
+        )
+    
+    @classmethod
+    def for_player(cls, player_id):
+        """Query the invites of a player with invite.event loaded by the same join."""
+        return cls.query.filter(cls.player_id == player_id).join(cls.event).options(
+            contains_eager(cls.event)
+        )
+    
+    @classmethod
+    def bulk_create(cls, event_id, player_ids):
+        """Insert pending invites for the players selected by `player_ids` in one statement.
+        
+        `player_ids` is a SELECT of player ids. Existing invites are skipped through the
+        (event_id, player_id) unique constraint. Returns (inserted, skipped).
+        """
+        candidates = player_ids.subquery()
+        total = db.session.scalar(select(func.count()).select_from(candidates))
+        if not total:
+            return 0, 0
+        rows = select(
+            literal(event_id),
+            candidates.c.id,
+            literal('pending'),
+            literal(datetime.utcnow(), db.DateTime)
+        ).where(true())
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'postgresql':
+            stmt = postgresql_insert(cls).from_select(
+                ['event_id', 'player_id', 'status', 'created_at'], rows
+            ).on_conflict_do_nothing(index_elements=['event_id', 'player_id'])
+        elif dialect == 'sqlite':
+            stmt = sqlite_insert(cls).from_select(
+                ['event_id', 'player_id', 'status', 'created_at'], rows
+            ).on_conflict_do_nothing(index_elements=['event_id', 'player_id'])
+        else:
+            existing = select(cls.id).where(cls.event_id == event_id, cls.player_id == candidates.c.id)
+            stmt = insert(cls).from_select(
+                ['event_id', 'player_id', 'status', 'created_at'], rows.where(~existing.exists())
+            )
+        inserted = db.session.execute(stmt).rowcount
+        # Set-based inserts bypass the mapper events that keep the counters in sync
+        if inserted:
+            Event.refresh_invite_counts([event_id])
+            PlayerAttendanceStats.rebuild(
+                db.session.connection(), select(cls.player_id).where(cls.event_id == event_id)
+            )
+        return inserted, total - inserted
     
     def __repr__(self):
         return f'<Invite Event:{self.event_id} Player:{self.player_id} Status:{self.status}>'
 
+# Seasons run from July to June and are identified by their starting year
+SEASON_START_MONTH = 7
+
+def season_of(day):
+    return day.year if day.month >= SEASON_START_MONTH else day.year - 1
+
+class PlayerAttendanceStats(db.Model):
+    """Invite counts per player, event type and season.
+    
+    Maintained incrementally by the Invite mapper events below, so statistics
+    pages never have to aggregate the invite table.
+    """
+    player_id = db.Column(db.Integer, db.ForeignKey('player.id'), primary_key=True)
+    event_type = db.Column(db.String(20), primary_key=True)
+    season = db.Column(db.Integer, primary_key=True)
+    invited = db.Column(db.Integer, nullable=False, default=0)
+    confirmed = db.Column(db.Integer, nullable=False, default=0)
+    declined = db.Column(db.Integer, nullable=False, default=0)
+    pending = db.Column(db.Integer, nullable=False, default=0)
+    # Bumped by every change, the conditional GET of the player page depends on it
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    player = db.relationship('Player', backref=db.backref(
+        'attendance_stats', lazy='dynamic', cascade='all, delete-orphan'
+    ))
+    
+    __table_args__ = (
+        db.Index('ix_player_attendance_stats_season_type', 'season', 'event_type'),
+    )
+    
+    @property
+    def attendance_rate(self):
+        return self.confirmed / self.invited if self.invited else None
+    
+    @property
+    def season_label(self):
+        return f'{self.season}/{(self.season + 1) % 100:02d}'
+    
+    @classmethod
+    def seasons(cls):
+        """Seasons with statistics, newest first.
+        
+        A recursive query steps from one season to the next lower one, one index
+        lookup per season, instead of a DISTINCT that reads the whole index.
+        """
+        seasons = select(func.max(cls.season).label('season')).cte('seasons', recursive=True)
+        previous = select(func.max(cls.season)).where(cls.season < seasons.c.season).scalar_subquery()
+        seasons = seasons.union_all(select(previous).where(seasons.c.season.isnot(None)))
+        return db.session.execute(
+            select(seasons.c.season).where(seasons.c.season.isnot(None)).order_by(seasons.c.season.desc())
+        ).scalars().all()
+    
+    @classmethod
+    def rebuild(cls, connection, player_ids=None):
+        """Recompute the statistics from invite and event in one set-based pass.
+        
+        `player_ids` (a list or a SELECT of ids) limits the rebuild to those players.
+        """
+        table = cls.__table__
+        month = db.extract('month', Event.date)
+        season = db.extract('year', Event.date) - db.case((month < SEASON_START_MONTH, 1), else_=0)
+        rows = select(
+            Invite.player_id,
+            Event.event_type,
+            season,
+            literal(datetime.utcnow(), db.DateTime),
+            func.count(Invite.id),
+            *[func.sum(db.case((Invite.status == status, 1), else_=0))
+              for status in ('confirmed', 'declined', 'pending')]
+        ).join(Event, Invite.event_id == Event.id).group_by(
+            Invite.player_id, Event.event_type, season
+        )
+        delete = table.delete()
+        if player_ids is not None:
+            rows = rows.where(Invite.player_id.in_(player_ids))
+            delete = delete.where(table.c.player_id.in_(player_ids))
+        connection.execute(delete)
+        connection.execute(table.insert().from_select(
+            ['player_id', 'event_type', 'season', 'updated_at', 'invited', 'confirmed', 'declined', 'pending'], rows
+        ))
+
+def _adjust_attendance_stats(connection, event_id, player_id, status, delta):
+    """Shift the statistics row of a player for the event's type and season."""
+    if event_id is None or player_id is None:
+        return
+    found = connection.execute(
+        select(Event.event_type, Event.date).where(Event.id == event_id)
+    ).first()
+    if found is None:
+        return
+    table = PlayerAttendanceStats.__table__
+    key = {'player_id': player_id, 'event_type': found.event_type, 'season': season_of(found.date)}
+    values = {'invited': table.c.invited + delta}
+    if status in ('confirmed', 'declined', 'pending'):
+        values[status] = table.c[status] + delta
+    result = connection.execute(
+        table.update().where(*[table.c[column] == value for column, value in key.items()]).values(values)
+    )
+    # Decrements never need a row; a missing row on delete means the player is being removed
+    if result.rowcount == 0 and delta > 0:
+        connection.execute(table.insert().values(
+            **key, invited=delta, **{s: (delta if s == status else 0) for s in ('confirmed', 'declined', 'pending')}
+        ))
+
+# Invite status -> Event counter column
+INVITE_STATUS_COUNTERS = {
+    'confirmed': 'confirmed_count',
+    'declined': 'declined_count',
+    'pending': 'pending_count',
+    'waitlisted': 'waitlisted_count',
+}
+
+def _adjust_invite_counter(connection, event_id, status, delta):
+    """Shift one RSVP counter of an event inside the current flush."""
+    column = INVITE_STATUS_COUNTERS.get(status)
+    if event_id is None or column is None:
+        return
+    event_table = Event.__table__
+    connection.execute(
+        event_table.update()
+        .where(event_table.c.id == event_id)
+        .values({column: event_table.c[column] + delta})
+    )
+
+def shift_invite_status(connection, event, player_id, old_status, new_status):
+    """Move one invite from old_status to new_status in the RSVP counters of its
+    event and in the player's statistics row, with one UPDATE each.
+    
+    For set-based status UPDATEs, which bypass the mapper events below. `event`
+    is a row with id, event_type and date.
+    """
+    changes = ((old_status, -1), (new_status, 1))
+    event_table = Event.__table__
+    counters = {INVITE_STATUS_COUNTERS[status]: event_table.c[INVITE_STATUS_COUNTERS[status]] + delta
+                for status, delta in changes if status in INVITE_STATUS_COUNTERS}
+    if counters:
+        connection.execute(event_table.update().where(event_table.c.id == event.id).values(counters))
+    stats_table = PlayerAttendanceStats.__table__
+    stats = {status: stats_table.c[status] + delta
+             for status, delta in changes if status in ('confirmed', 'declined', 'pending')}
+    if stats:
+        connection.execute(stats_table.update().where(
+            stats_table.c.player_id == player_id,
+            stats_table.c.event_type == event.event_type,
+            stats_table.c.season == season_of(event.date)
+        ).values(stats))
+
+@event.listens_for(Invite, 'after_insert')
+def _invite_inserted(mapper, connection, target):
+    status = target.status or 'pending'
+    _adjust_invite_counter(connection, target.event_id, status, 1)
+    _adjust_attendance_stats(connection, target.event_id, target.player_id, status, 1)
+
+@event.listens_for(Invite, 'after_delete')
+def _invite_deleted(mapper, connection, target):
+    status = target.status or 'pending'
+    _adjust_invite_counter(connection, target.event_id, status, -1)
+    _adjust_attendance_stats(connection, target.event_id, target.player_id, status, -1)
+
+@event.listens_for(Invite, 'after_update')
+def _invite_updated(mapper, connection, target):
+    state = db.inspect(target)
+    status_history = state.attrs.status.history
+    event_history = state.attrs.event_id.history
+    player_history = state.attrs.player_id.history
+    if not (status_history.has_changes() or event_history.has_changes()
+            or player_history.has_changes()):
+        return
+    old_status = status_history.deleted[0] if status_history.deleted else target.status
+    old_event_id = event_history.deleted[0] if event_history.deleted else target.event_id
+    old_player_id = player_history.deleted[0] if player_history.deleted else target.player_id
+    _adjust_invite_counter(connection, old_event_id, old_status or 'pending', -1)
+    _adjust_invite_counter(connection, target.event_id, target.status or 'pending', 1)
+    _adjust_attendance_stats(connection, old_event_id, old_player_id, old_status or 'pending', -1)
+    _adjust_attendance_stats(connection, target.event_id, target.player_id, target.status or 'pending', 1)
+
+@event.listens_for(Event, 'after_update')
+def _event_updated(mapper, connection, target):
+    # Moving an event to another type or season moves its invites in the statistics
+    state = db.inspect(target)
+    if state.attrs.event_type.history.has_changes() or state.attrs.date.history.has_changes():
+        PlayerAttendanceStats.rebuild(
+            connection, select(Invite.player_id).where(Invite.event_id == target.id)
+        )
+
 class News(db.Model):
     """News/Announcements model."""
     id = db.Column(db.Integer, primary_key=True)
@@ -105,9 +519,68 @@ class News(db.Model):
     # Relationships
     author = db.relationship('User', backref='news_posts')
     
+    # Indexes for the published news feed and the admin list, newest first
+    __table_args__ = (
+        db.Index('ix_news_published_created', 'published', 'created_at'),
+        db.Index('ix_news_created', 'created_at'),
+        # Ids are never reused: job idempotency keys name news items by id
+        {'sqlite_autoincrement': True},
+    )
+    
     def __repr__(self):
         return f'<News {self.title}>'
 
+class CacheVersion(db.Model):
+    """Version counters of process-local caches, bumped in the writing transaction."""
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    
+    @classmethod
+    def current(cls, name):
+        """Current version of a cache, read at most once per request."""
+        versions = g.setdefault('_cache_versions', {})
+        if name not in versions:
+            versions[name] = db.session.scalar(select(cls.version).where(cls.name == name)) or 0
+        return versions[name]
+    
+    @classmethod
+    def bump(cls, connection, name):
+        """Increment a cache version on the given connection."""
+        table = cls.__table__
+        result = connection.execute(
+            table.update().where(table.c.name == name).values(version=table.c.version + 1)
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(name=name, version=1))
+
+class Job(db.Model):
+    """Background job in the database queue, run by `flask run-worker`.
+    
+    Jobs are inserted in the same transaction as the change that caused them,
+    so a rolled back request never sends anything.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    # Jobs with the same key are only enqueued once, done jobs keep their key
+    idempotency_key = db.Column(db.String(200), unique=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(100))
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    
+    # Index for the worker's "due jobs by run_at" poll
+    __table_args__ = (
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+    )
+    
+    def __repr__(self):
+        return f'<Job {self.kind} {self.status}>'
+
 class ClothingRule(db.Model):
     """Clothing rules for different event types."""
     id = db.Column(db.Integer, primary_key=True)
@@ -116,5 +589,28 @@ class ClothingRule(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Process-local copy of all rules by event_type, see cached_rules()
+    _cache = {'version': None, 'rules': {}}
+    
+    @classmethod
+    def cached_rules(cls):
+        """All rules by event_type, reloaded only when the 'clothing_rule' version changed.
+        
+        The rules are detached from the session, so they can be shared across requests.
+        """
+        version = CacheVersion.current('clothing_rule')
+        if cls._cache['version'] != version:
+            rules = cls.query.order_by(cls.event_type).all()
+            for rule in rules:
+                db.session.expunge(rule)
+            cls._cache = {'version': version, 'rules': {rule.event_type: rule for rule in rules}}
+        return cls._cache['rules']
+    
     def __repr__(self):
         return f'<ClothingRule {self.event_type}>'
+
+@event.listens_for(ClothingRule, 'after_insert')
+@event.listens_for(ClothingRule, 'after_update')
+@event.listens_for(ClothingRule, 'after_delete')
+def _clothing_rule_changed(mapper, connection, target):
+    CacheVersion.bump(connection, 'clothing_rule')
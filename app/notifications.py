@@ -0,0 +1,102 @@
+from itertools import groupby
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.orm import contains_eager
+from app import db
+from app.jobs import enqueue, enqueue_many, job_handler
+from app.mail import build_message, mail_setting, render_batch, send_messages
+from app.models import Invite, News, Player
+from app.rsvp import rsvp_urls
+
+def notify_invite(invite):
+    """Queue the invitation mail of one (flushed) invite."""
+    enqueue('invite_email', {'invite_id': invite.id}, key=f'invite:{invite.id}')
+
+def notify_event_invites(event_id):
+    """Queue mails for all pending invites of an event; already mailed ones are skipped."""
+    enqueue('invite_fanout', {'event_id': event_id})
+
+def notify_news(news):
+    """Queue the newsletter of a published news item, at most once per item."""
+    enqueue('news_fanout', {'news_id': news.id}, key=f'news:{news.id}')
+
+def _send(jobs, messages):
+    """Send {job id: message} in one batch and return {job id: error}."""
+    job_ids = list(messages)
+    failures = send_messages([messages[job_id] for job_id in job_ids])
+    return {job_ids[index]: error for index, error in failures.items()}
+
+def _render_context():
+    # Mails are rendered in the worker, outside of any request
+    return current_app.test_request_context(base_url=mail_setting('MAIL_BASE_URL'))
+
+@job_handler('invite_fanout')
+def _invite_fanout(jobs):
+    for job in jobs:
+        invite_ids = db.session.scalars(select(Invite.id).where(
+            Invite.event_id == job.payload['event_id'], Invite.status == 'pending'
+        ))
+        enqueue_many('invite_email', [(f'invite:{invite_id}', {'invite_id': invite_id})
+                                      for invite_id in invite_ids])
+
+@job_handler('invite_email')
+def _invite_email(jobs):
+    invites = {invite.id: invite for invite in Invite.query.filter(
+        Invite.id.in_([job.payload['invite_id'] for job in jobs])
+    ).join(Invite.event).join(Invite.player).options(
+        contains_eager(Invite.event), contains_eager(Invite.player)
+    )}
+    # Deleted invites and players without address need no mail
+    jobs = [job for job in jobs if job.payload['invite_id'] in invites
+            and invites[job.payload['invite_id']].player.email]
+    messages = {}
+    with _render_context():
+        # One rendering per event, the player's name and links are filled in per mail
+        for _, group in groupby(sorted(jobs, key=lambda job: invites[job.payload['invite_id']].event_id),
+                                key=lambda job: invites[job.payload['invite_id']].event_id):
+            group = [(job, invites[job.payload['invite_id']]) for job in group]
+            event = group[0][1].event
+            bodies = render_batch(
+                'emails/invite.txt',
+                [{'player': invite.player, 'links': rsvp_urls(invite)} for _, invite in group],
+                ('player', 'links'),
+                event=event
+            )
+            subject = f'Einladung: {event.title} am {event.date.strftime("%d.%m.%Y")}'
+            for (job, invite), body in zip(group, bodies):
+                messages[job.id] = build_message(invite.player.email, subject, body)
+    return _send(jobs, messages)
+
+@job_handler('news_fanout')
+def _news_fanout(jobs):
+    for job in jobs:
+        news_id = job.payload['news_id']
+        player_ids = db.session.scalars(select(Player.id).where(Player.active == True))
+        enqueue_many('news_email', [(f'news:{news_id}:player:{player_id}',
+                                     {'news_id': news_id, 'player_id': player_id})
+                                    for player_id in player_ids])
+
+@job_handler('news_email')
+def _news_email(jobs):
+    news = {item.id: item for item in News.query.filter(
+        News.id.in_({job.payload['news_id'] for job in jobs}), News.published == True
+    )}
+    players = {player.id: player for player in Player.query.filter(
+        Player.id.in_([job.payload['player_id'] for job in jobs])
+    )}
+    jobs = [job for job in jobs
+            if job.payload['news_id'] in news and job.payload['player_id'] in players]
+    messages = {}
+    with _render_context():
+        # One rendering per news item, the player's name is filled in per mail
+        for news_id, group in groupby(sorted(jobs, key=lambda job: job.payload['news_id']),
+                                      key=lambda job: job.payload['news_id']):
+            group = list(group)
+            item = news[news_id]
+            recipients = [players[job.payload['player_id']] for job in group]
+            bodies = render_batch('emails/news.txt', [{'player': player} for player in recipients],
+                                  ('player',), news=item)
+            subject = f"{current_app.config['CLUB_NAME']}: {item.title}"
+            for job, player, body in zip(group, recipients, bodies):
+                messages[job.id] = build_message(player.email, subject, body)
+    return _send(jobs, messages)
@@ -0,0 +1,176 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime, time
+from flask import abort, current_app, request, url_for
+from sqlalchemy import literal, tuple_
+
+class KeysetPagination:
+    """One page of a keyset (seek) pagination.
+
+    Pages are addressed by opaque cursors holding the sort key of the first or
+    last row, so a deep page costs the same as the first one. It has the
+    interface of Flask-SQLAlchemy's Pagination, so list templates can render
+    either: the cursor carries the page number, and `total`, `pages` and
+    `iter_pages()` run the COUNT query only when a template asks for them.
+    Numbered links (`?page=`) are served by the offset pagination.
+    """
+
+    def __init__(self, items, page=1, per_page=20, next_cursor=None, prev_cursor=None,
+                 total=None, count_query=None):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self._total = total
+        self._count_query = count_query
+
+    @property
+    def total(self):
+        if self._total is None and self._count_query is not None:
+            self._total = self._count_query.count()
+        return self._total
+
+    @property
+    def pages(self):
+        if not self.total:
+            return 0
+        return -(-self.total // self.per_page)
+
+    @property
+    def first(self):
+        return (self.page - 1) * self.per_page + 1 if self.items else 0
+
+    @property
+    def last(self):
+        return self.first + len(self.items) - 1 if self.items else 0
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    @property
+    def next_num(self):
+        return self.page + 1 if self.has_next else None
+
+    @property
+    def prev_num(self):
+        return self.page - 1 if self.has_prev else None
+
+    def next_url(self):
+        return _url_with_cursor(self.next_cursor) if self.has_next else None
+
+    def prev_url(self):
+        return _url_with_cursor(self.prev_cursor) if self.has_prev else None
+
+    def iter_pages(self, *, left_edge=2, left_current=2, right_current=4, right_edge=2):
+        """Page numbers for a page list, None for a gap, as in Flask-SQLAlchemy."""
+        pages_end = self.pages + 1
+        if pages_end == 1:
+            return
+        left_end = min(1 + left_edge, pages_end)
+        yield from range(1, left_end)
+        if left_end == pages_end:
+            return
+        mid_start = max(left_end, self.page - left_current)
+        mid_end = min(self.page + right_current + 1, pages_end)
+        if mid_start - left_end > 0:
+            yield None
+        yield from range(mid_start, mid_end)
+        if mid_end == pages_end:
+            return
+        right_start = max(mid_end, pages_end - right_edge)
+        if right_start - mid_end > 0:
+            yield None
+        yield from range(right_start, pages_end)
+
+def _url_with_cursor(cursor):
+    args = request.args.to_dict()
+    args.pop('page', None)
+    args['cursor'] = cursor
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+def _encode_value(value):
+    if isinstance(value, (date, time, datetime)):
+        return value.isoformat()
+    return value
+
+def _decode_value(value, column):
+    python_type = column.type.python_type
+    if value is not None and python_type in (date, time, datetime):
+        return python_type.fromisoformat(value)
+    return value
+
+def encode_cursor(direction, values, page):
+    """Cursor of the page number `page`, seeking from the sort key `values` in `direction`."""
+    payload = json.dumps([direction, [_encode_value(value) for value in values], page])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, columns):
+    """Return (direction, key values, page) of a cursor, abort with 400 if it is malformed."""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, values, page = json.loads(payload)
+        if direction not in ('next', 'prev') or len(values) != len(columns) \
+                or not isinstance(page, int) or page < 1:
+            raise ValueError(cursor)
+        values = [_decode_value(value, column) for value, column in zip(values, columns)]
+        return direction, values, page
+    except (binascii.Error, ValueError, TypeError):
+        abort(400)
+
+def keyset_paginate(query, columns, cursor=None, per_page=20, descending=False, with_count=False):
+    """Seek-paginate `query` over the unique sort key `columns` (e.g. date, time, id).
+
+    All columns sort in the same direction, descending if `descending` is set.
+    """
+    direction, values, page = decode_cursor(cursor, columns) if cursor else ('next', None, 1)
+    backwards = direction == 'prev'
+    ascending = descending == backwards
+
+    count_query = query.order_by(None)
+    total = count_query.count() if with_count else None
+
+    key = tuple_(*columns)
+    if values is not None:
+        bound = tuple_(*[literal(value, column.type) for value, column in zip(values, columns)])
+        query = query.filter(key > bound if ascending else key < bound)
+    query = query.order_by(None).order_by(
+        *[column.asc() if ascending else column.desc() for column in columns]
+    )
+
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    has_next = has_more if not backwards else True
+    has_prev = has_more if backwards else values is not None
+    next_cursor = prev_cursor = None
+    if rows and has_next:
+        next_cursor = encode_cursor('next', [getattr(rows[-1], column.key) for column in columns],
+                                    page + 1)
+    if rows and has_prev:
+        # Rows inserted before this page since it was reached may leave no page 1 behind it
+        prev_cursor = encode_cursor('prev', [getattr(rows[0], column.key) for column in columns],
+                                    max(page - 1, 1))
+    return KeysetPagination(rows, page, per_page, next_cursor, prev_cursor, total, count_query)
+
+def paginate_request(query, columns, descending=False, with_count=False):
+    """Paginate by ?cursor= (keyset) or, for existing links, by ?page= (offset)."""
+    per_page = current_app.config['ITEMS_PER_PAGE']
+    if 'page' in request.args:
+        order = [column.desc() if descending else column.asc() for column in columns]
+        return query.order_by(None).order_by(*order).paginate(
+            page=request.args.get('page', 1, type=int),
+            per_page=per_page,
+            error_out=False
+        )
+    return keyset_paginate(query, columns, request.args.get('cursor'), per_page,
+                           descending, with_count)
@@ -0,0 +1,144 @@
+import csv
+import io
+import re
+from datetime import datetime
+from sqlalchemy import select
+from app import db
+from app.models import Player
+
+# Header names accepted for each player field, the German ones match the export
+COLUMNS = {
+    'first_name': ('vorname', 'first_name'),
+    'last_name': ('nachname', 'last_name'),
+    'email': ('e-mail', 'email'),
+    'phone': ('telefon', 'phone'),
+    'position': ('position',),
+    'jersey_number': ('trikotnummer', 'jersey_number'),
+    'birth_date': ('geburtsdatum', 'birth_date'),
+    'team': ('team',),
+    'active': ('aktiv', 'active'),
+}
+
+LABELS = {
+    'first_name': 'Vorname', 'last_name': 'Nachname', 'email': 'E-Mail', 'phone': 'Telefon',
+    'position': 'Position',
+}
+MAX_LENGTHS = {'first_name': 50, 'last_name': 50, 'email': 120, 'phone': 20, 'position': 50}
+TEAMS = ('A-Team', 'B-Team', 'Jugend', 'Senioren')
+TRUE_VALUES = ('1', 'true', 'ja', 'yes', 'x')
+FALSE_VALUES = ('0', 'false', 'nein', 'no')
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+BATCH_SIZE = 500
+
+class ImportResult:
+    """Outcome of a player import with the errors per CSV line."""
+
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.errors.append((line, message))
+
+def _parse_date(value):
+    for fmt in ('%Y-%m-%d', '%d.%m.%Y'):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f'Ungültiges Geburtsdatum "{value}".')
+
+def _parse_row(raw):
+    """Validate one CSV row like PlayerForm does, return the player values."""
+    values = {field: (raw.get(field) or '').strip() for field in COLUMNS}
+    errors = []
+    for field in ('first_name', 'last_name', 'email'):
+        if not values[field]:
+            errors.append(f'{LABELS[field]} fehlt.')
+    for field, max_length in MAX_LENGTHS.items():
+        if len(values[field]) > max_length:
+            errors.append(f'{LABELS[field]} ist länger als {max_length} Zeichen.')
+    if values['email'] and not EMAIL_PATTERN.match(values['email']):
+        errors.append(f'Ungültige E-Mail-Adresse "{values["email"]}".')
+    if values['team'] and values['team'] not in TEAMS:
+        errors.append(f'Unbekanntes Team "{values["team"]}".')
+
+    player = {field: values[field] or None for field in MAX_LENGTHS}
+    player['team'] = values['team'] or None
+    try:
+        player['jersey_number'] = int(values['jersey_number']) if values['jersey_number'] else None
+    except ValueError:
+        errors.append(f'Ungültige Trikotnummer "{values["jersey_number"]}".')
+    try:
+        player['birth_date'] = _parse_date(values['birth_date']) if values['birth_date'] else None
+    except ValueError as e:
+        errors.append(str(e))
+    active = values['active'].lower()
+    if active and active not in TRUE_VALUES + FALSE_VALUES:
+        errors.append(f'Ungültiger Wert für aktiv "{values["active"]}".')
+    player['active'] = active not in FALSE_VALUES
+    return player, errors
+
+def read_rows(stream):
+    """Yield (line number, row dict keyed by field) from a CSV text stream."""
+    sample = stream.read(4096)
+    stream.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=';,')
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(stream, dialect)
+    header = [name.strip().lstrip('\ufeff').lower() for name in next(reader, [])]
+    fields = {}
+    for field, names in COLUMNS.items():
+        for name in names:
+            if name in header:
+                fields[field] = header.index(name)
+                break
+    for line, row in enumerate(reader, start=2):
+        if not any(cell.strip() for cell in row):
+            continue
+        yield line, {field: row[index] if index < len(row) else '' for field, index in fields.items()}
+
+def import_players(stream, dry_run=False):
+    """Validate all rows in one pass, then upsert the valid ones by email in batches.
+
+    Existing emails are read with a single query; inserts and updates are sent as
+    executemany batches. Nothing is committed; the caller commits or rolls back.
+    """
+    result = ImportResult()
+    existing = dict(db.session.execute(select(Player.email, Player.id)).all())
+    seen = {}
+    inserts, updates = [], []
+    for line, raw in read_rows(stream):
+        player, errors = _parse_row(raw)
+        if player['email'] in seen:
+            errors.append(f'E-Mail-Adresse bereits in Zeile {seen[player["email"]]}.')
+        for error in errors:
+            result.add_error(line, error)
+        if errors:
+            continue
+        seen[player['email']] = line
+        if player['email'] in existing:
+            # Only overwrite the columns the file actually contains
+            player = {field: value for field, value in player.items() if field in raw}
+            player['id'] = existing[player['email']]
+            updates.append(player)
+        else:
+            inserts.append(player)
+
+    result.inserted, result.updated = len(inserts), len(updates)
+    if dry_run:
+        return result
+    for start in range(0, len(inserts), BATCH_SIZE):
+        db.session.bulk_insert_mappings(Player, inserts[start:start + BATCH_SIZE])
+    for start in range(0, len(updates), BATCH_SIZE):
+        db.session.bulk_update_mappings(Player, updates[start:start + BATCH_SIZE])
+    return result
+
+def import_players_file(file_storage, dry_run=False):
+    """Import an uploaded CSV file, decoding it as UTF-8 with an optional BOM."""
+    stream = io.StringIO(file_storage.read().decode('utf-8-sig'))
+    return import_players(stream, dry_run)
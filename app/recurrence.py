@@ -0,0 +1,160 @@
+from datetime import date, datetime, timedelta
+from heapq import merge
+from itertools import islice
+from flask import abort, url_for
+from sqlalchemy import or_, select, union_all
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Event, EventSeries, EventSeriesCancellation, SERIES_EVENT_FIELDS
+
+class Occurrence:
+    """A date of an event series without an Event row, shaped like one for views and feeds."""
+    id = None
+    confirmed_count = declined_count = pending_count = waitlisted_count = 0
+    is_full = False
+
+    def __init__(self, series, day):
+        self.series = series
+        self.series_id = series.id
+        self.date = self.occurrence_date = day
+        self.updated_at = series.updated_at
+        for name in SERIES_EVENT_FIELDS:
+            setattr(self, name, getattr(series, name))
+
+    def get_confirmed_count(self):
+        return 0
+
+    def get_declined_count(self):
+        return 0
+
+    def get_pending_count(self):
+        return 0
+
+    def get_waitlisted_count(self):
+        return 0
+
+def event_url(event):
+    """Detail URL of an Event row or of an occurrence that has none."""
+    if event.id is not None:
+        return url_for('main.event_detail', id=event.id)
+    return url_for('main.occurrence_detail', id=event.series_id, day=event.date.isoformat())
+
+def parse_day(day):
+    """The date of an occurrence URL, 404 for anything else."""
+    try:
+        return datetime.strptime(day, '%Y-%m-%d').date()
+    except ValueError:
+        abort(404)
+
+def by_start(*iterables):
+    """Merge iterables of events sorted by date and time into one sorted iterator."""
+    return merge(*iterables, key=lambda event: (event.date, event.time))
+
+def series_query(start, end=None, event_type=None):
+    """Series with possible dates in [start, end); one row per series, however long it runs."""
+    query = EventSeries.query.filter(or_(EventSeries.until.is_(None), EventSeries.until >= start))
+    if end is not None:
+        query = query.filter(EventSeries.start_date < end)
+    if event_type and event_type != 'all':
+        query = query.filter(EventSeries.event_type == event_type)
+    return query
+
+def _taken_dates(series_ids, start, end=None):
+    """(series id, date) of the occurrences the rule must skip: materialized and cancelled ones."""
+    if not series_ids:
+        return set()
+    materialized = select(Event.series_id, Event.occurrence_date).where(
+        Event.series_id.in_(series_ids), Event.occurrence_date >= start
+    )
+    cancelled = select(EventSeriesCancellation.series_id, EventSeriesCancellation.date).where(
+        EventSeriesCancellation.series_id.in_(series_ids), EventSeriesCancellation.date >= start
+    )
+    if end is not None:
+        materialized = materialized.where(Event.occurrence_date < end)
+        cancelled = cancelled.where(EventSeriesCancellation.date < end)
+    return {tuple(row) for row in db.session.execute(union_all(materialized, cancelled))}
+
+def _occurrences(series, start, end, taken):
+    for day in series.dates(start, end):
+        if (series.id, day) not in taken:
+            yield Occurrence(series, day)
+
+def expand(series, start, end=None):
+    """Occurrences of the given series in [start, end) that have no Event row,
+    sorted by date and time. Without `end` the iterator is endless; slice it."""
+    series = list(series)
+    taken = _taken_dates([item.id for item in series], start, end)
+    return by_start(*[_occurrences(item, start, end, taken) for item in series])
+
+def occurrences_between(start, end, event_type=None):
+    """Occurrences without Event row in [start, end), e.g. for a calendar month."""
+    return list(expand(series_query(start, end, event_type), start, end))
+
+def upcoming_occurrences(start, limit):
+    """The next `limit` occurrences without Event row from `start` on."""
+    return list(islice(expand(series_query(start), start), limit))
+
+def excluded_dates(series):
+    """{series id: sorted dates} that an RRULE of the series must exclude (EXDATE)."""
+    series_ids = [item.id for item in series]
+    excluded = {}
+    for series_id, day in sorted(_taken_dates(series_ids, date.min)):
+        excluded.setdefault(series_id, []).append(day)
+    return excluded
+
+def find_occurrence(series, day):
+    """The Event row of an occurrence, an Occurrence if it has none, or None if
+    the series has no (not cancelled) date on that day."""
+    event = Event.query.filter_by(series_id=series.id, occurrence_date=day).first()
+    if event is not None:
+        return event
+    if next(series.dates(day, day + timedelta(days=1)), None) != day:
+        return None
+    if db.session.get(EventSeriesCancellation, (series.id, day)) is not None:
+        return None
+    return Occurrence(series, day)
+
+def materialize(series, day, created_by=None):
+    """Return the Event row of an occurrence, creating it from the series first.
+
+    Needed before an occurrence can get invites or be edited on its own. Returns
+    None if the series has no such date.
+    """
+    found = find_occurrence(series, day)
+    if found is None or found.id is not None:
+        return found
+    event = Event(series_id=series.id, occurrence_date=day, date=day, created_by=created_by,
+                  **{name: getattr(series, name) for name in SERIES_EVENT_FIELDS})
+    try:
+        with db.session.begin_nested():
+            db.session.add(event)
+    except IntegrityError:
+        # Materialized by a concurrent request in the meantime
+        return Event.query.filter_by(series_id=series.id, occurrence_date=day).first()
+    return event
+
+def cancel_occurrence(series, day):
+    """Drop one date of a series; a materialized occurrence has to be deleted by the caller."""
+    if db.session.get(EventSeriesCancellation, (series.id, day)) is None:
+        db.session.add(EventSeriesCancellation(series_id=series.id, date=day))
+    # Bumps the series in the conditional GET validators of the calendar views
+    series.updated_at = datetime.utcnow()
+
+def apply_series_changes(series, previous):
+    """Copy changed series fields to its upcoming materialized occurrences.
+
+    `previous` holds the field values before the edit. Occurrences whose field
+    was edited on its own keep it. Returns the events whose max_participants
+    changed, so their waitlist can be promoted.
+    """
+    changed = [name for name in SERIES_EVENT_FIELDS if getattr(series, name) != previous[name]]
+    resized = []
+    if not changed:
+        return resized
+    for event in series.events.filter(Event.date >= date.today()):
+        for name in changed:
+            if getattr(event, name) == previous[name]:
+                setattr(event, name, getattr(series, name))
+                if name == 'max_participants':
+                    resized.append(event)
+    return resized
@@ -0,0 +1,159 @@
+from datetime import datetime
+from flask import current_app, url_for
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy import exists, func, or_, select, update
+from sqlalchemy.orm import aliased
+from app import db
+from app.models import Event, Invite, shift_invite_status
+
+# Statuses a player can answer with from an RSVP link
+RSVP_STATUSES = ('confirmed', 'declined')
+
+# RSVP settings, each can be overridden by the config key of the same name
+DEFAULTS = {
+    'RSVP_TOKEN_MAX_AGE': 180 * 24 * 3600,  # seconds an RSVP link stays valid
+}
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='rsvp')
+
+def rsvp_token(invite, status):
+    """Signed token for setting one invite to one status; it needs no server state.
+    
+    The player and event are signed along with the invite id, so the link of a
+    deleted invite cannot answer a new invite that reuses its id.
+    """
+    return _serializer().dumps([invite.id, invite.player_id, invite.event_id, status])
+
+def load_rsvp_token(token):
+    """Return (invite_id, player_id, event_id, status) of a valid, unexpired token, otherwise None."""
+    max_age = current_app.config.get('RSVP_TOKEN_MAX_AGE', DEFAULTS['RSVP_TOKEN_MAX_AGE'])
+    try:
+        invite_id, player_id, event_id, status = _serializer().loads(token, max_age=max_age)
+    except (BadSignature, TypeError, ValueError):
+        return None
+    if not all(isinstance(value, int) for value in (invite_id, player_id, event_id)) \
+            or status not in RSVP_STATUSES:
+        return None
+    return invite_id, player_id, event_id, status
+
+def rsvp_urls(invite):
+    """External RSVP links of an invite, keyed by status."""
+    return {status: url_for('main.rsvp', token=rsvp_token(invite, status), _external=True)
+            for status in RSVP_STATUSES}
+
+def _lock_event(event_id):
+    """Serialize seat changes of an event and return its id, event_type and date.
+
+    FOR UPDATE locks the row on server databases and, on every database, routes
+    the read to the primary. SQLite ignores it; its writers are serialized by the
+    first UPDATE and the compare-and-set conditions below.
+    """
+    return db.session.execute(
+        select(Event.id, Event.event_type, Event.date).where(Event.id == event_id).with_for_update()
+    ).first()
+
+def _seat_available():
+    """Condition on the updated invite row: its event has a free seat, read from the RSVP counter."""
+    return exists().where(
+        Event.id == Invite.event_id,
+        or_(Event.max_participants.is_(None), Event.confirmed_count < Event.max_participants)
+    )
+
+def _update_invites(*conditions, **values):
+    return db.session.execute(
+        update(Invite).where(*conditions).values(**values),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+
+def _promote(event):
+    """Confirm waitlisted invites in order while seats are free, return the number promoted."""
+    promoted = 0
+    while True:
+        head = db.session.execute(
+            select(Invite.id, Invite.player_id)
+            .where(Invite.event_id == event.id, Invite.status == 'waitlisted')
+            .order_by(Invite.waitlist_position)
+            .limit(1)
+        ).first()
+        if head is None or not _update_invites(
+            Invite.id == head.id, Invite.status == 'waitlisted', _seat_available(),
+            status='confirmed', waitlist_position=None
+        ):
+            return promoted
+        # The bulk UPDATE bypasses the mapper events that keep these in sync
+        shift_invite_status(db.session.connection(), event, head.player_id, 'waitlisted', 'confirmed')
+        promoted += 1
+
+def promote_waitlist(event_id):
+    """Fill free seats of an event from its waitlist, e.g. after an invite was
+    deleted or max_participants was raised. Returns the number of promotions."""
+    event = _lock_event(event_id)
+    return _promote(event) if event is not None else 0
+
+def set_invite_status(invite_id, player_id, event_id, status):
+    """Change an invite's status with a conditional UPDATE.
+
+    A confirmation takes a free seat or, if the event is full, queues the invite
+    at the end of the waitlist. A decline of a confirmed invite frees the seat
+    for the head of the waitlist in the same transaction. The seat check is part
+    of the UPDATE, so concurrent answers cannot overbook. Player and event are
+    part of the condition, so only the invite a token was issued for can change.
+    The RSVP counters and statistics are shifted by one, not recounted.
+
+    Returns the new status, 'unchanged' or None if the invite does not exist.
+    """
+    now = datetime.utcnow()
+    while True:
+        # FOR UPDATE locks invite and event on server databases and reads from the primary
+        current = db.session.execute(
+            select(Invite.status, Event.id, Event.event_type, Event.date)
+            .join(Event, Invite.event_id == Event.id)
+            .where(Invite.id == invite_id, Invite.player_id == player_id, Invite.event_id == event_id)
+            .with_for_update()
+        ).first()
+        if current is None:
+            return None
+        if current.status == status or (status == 'confirmed' and current.status == 'waitlisted'):
+            return 'unchanged'
+
+        # The old status makes each UPDATE a compare-and-set: on SQLite another
+        # answer may have changed the invite since the SELECT, then it is re-read
+        same_invite = (Invite.id == invite_id, Invite.status == current.status)
+        new_status = status
+        if status == 'confirmed':
+            changed = _update_invites(
+                *same_invite, _seat_available(),
+                status='confirmed', response_date=now, waitlist_position=None
+            )
+            if not changed:
+                new_status = 'waitlisted'
+                waitlisted = aliased(Invite)
+                position = select(func.coalesce(func.max(waitlisted.waitlist_position), 0) + 1).where(
+                    waitlisted.event_id == Invite.event_id
+                ).scalar_subquery()
+                changed = _update_invites(
+                    *same_invite,
+                    status='waitlisted', response_date=now, waitlist_position=position
+                )
+        else:
+            changed = _update_invites(
+                *same_invite,
+                status=status, response_date=now, waitlist_position=None
+            )
+        if changed:
+            break
+
+    # The bulk UPDATEs bypass the mapper events that keep these in sync
+    shift_invite_status(db.session.connection(), current, player_id, current.status, new_status)
+    if current.status == 'confirmed':
+        _promote(current)
+    return new_status
+
+def waitlist_rank(invite):
+    """1-based place of a waitlisted invite, counted with an index range query."""
+    return db.session.scalar(select(func.count(Invite.id)).where(
+        Invite.event_id == invite.event_id,
+        Invite.status == 'waitlisted',
+        Invite.waitlist_position <= invite.waitlist_position
+    ))
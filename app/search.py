@@ -0,0 +1,136 @@
+import re
+from markupsafe import Markup, escape
+from sqlalchemy import event, inspect, or_, text
+from sqlalchemy.exc import OperationalError
+from app import db
+from app.models import Event, Player, News
+
+# Model -> columns mirrored into its FTS5 table "<table>_fts"
+SEARCH_INDEXES = {
+    News: ('title', 'content'),
+    Event: ('title', 'description', 'location'),
+    Player: ('first_name', 'last_name', 'position', 'team'),
+}
+
+# Snippet markers, replaced by <mark> after the snippet text was escaped
+_MARK_START, _MARK_END = '\x02', '\x03'
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+class SearchHit:
+    """One search result with an escaped, highlighted snippet."""
+
+    def __init__(self, obj, snippet, rank=None):
+        self.obj = obj
+        self.snippet = snippet
+        self.rank = rank
+
+def _fts_table(model):
+    return f'{model.__tablename__}_fts'
+
+def _fts_ddl(model):
+    """CREATE statements for the FTS5 mirror of a model and its sync triggers."""
+    table, fts, columns = model.__tablename__, _fts_table(model), SEARCH_INDEXES[model]
+    cols = ', '.join(columns)
+    new_values = ', '.join(f'new.{c}' for c in columns)
+    old_values = ', '.join(f'old.{c}' for c in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, "
+        f"content='{table}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END",
+        # Only the mirrored columns, so RSVP counter updates do not rewrite the index
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+    ]
+
+def create_search_index(connection, rebuild=False):
+    """Create the FTS5 mirrors and triggers; return False if FTS5 is unavailable."""
+    if connection.dialect.name != 'sqlite':
+        return False
+    try:
+        for model in SEARCH_INDEXES:
+            for statement in _fts_ddl(model):
+                connection.exec_driver_sql(statement)
+            if rebuild:
+                fts = _fts_table(model)
+                connection.exec_driver_sql(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+    except OperationalError:
+        return False
+    return True
+
+def _create_on_table_create(target, connection, **kw):
+    # The mirrors need all three base tables, so wait for the last one
+    if connection.dialect.name != 'sqlite':
+        return
+    tables = {model.__tablename__ for model in SEARCH_INDEXES}
+    if tables <= set(inspect(connection).get_table_names()):
+        create_search_index(connection, rebuild=True)
+
+for _model in SEARCH_INDEXES:
+    event.listen(_model.__table__, 'after_create', _create_on_table_create)
+
+def fts_available():
+    """True if the FTS5 mirrors exist in the current database."""
+    bind = db.session.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return False
+    names = [_fts_table(model) for model in SEARCH_INDEXES]
+    found = db.session.execute(
+        text("SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name IN "
+             f"({', '.join(repr(name) for name in names)})")
+    ).scalar()
+    return found == len(names)
+
+def _terms(query):
+    return _TOKEN.findall(query)[:10]
+
+def _highlight(snippet):
+    return Markup(str(escape(snippet)).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>'))
+
+def _fts_search(model, terms, filters, limit):
+    fts = _fts_table(model)
+    # Every term as a quoted prefix query, so user input cannot inject FTS syntax
+    match = ' '.join(f'"{term}"*' for term in terms)
+    rows = db.session.execute(text(
+        f"SELECT {fts}.rowid, bm25({fts}) AS rank, "
+        f"snippet({fts}, -1, '{_MARK_START}', '{_MARK_END}', '…', 12) AS snippet "
+        f"FROM {fts} WHERE {fts} MATCH :match ORDER BY rank LIMIT :limit"
+    ), {'match': match, 'limit': limit * 4 if filters else limit}).all()
+    if not rows:
+        return []
+    objects = {obj.id: obj for obj in model.query.filter(
+        model.id.in_([row.rowid for row in rows]), *filters
+    )}
+    hits = [SearchHit(objects[row.rowid], _highlight(row.snippet), row.rank)
+            for row in rows if row.rowid in objects]
+    return hits[:limit]
+
+def _like_search(model, terms, filters, limit):
+    columns = [getattr(model, name) for name in SEARCH_INDEXES[model]]
+    conditions = [or_(*[column.ilike(f'%{term}%') for column in columns]) for term in terms]
+    hits = []
+    for obj in model.query.filter(*conditions, *filters).limit(limit):
+        texts = [getattr(obj, name) or '' for name in SEARCH_INDEXES[model]]
+        hits.append(SearchHit(obj, escape(' – '.join(t for t in texts if t)[:200])))
+    return hits
+
+def search(query, include_hidden=False, limit=10):
+    """Search news, events and players; hidden rows (unpublished news, inactive
+    players) only when `include_hidden` is set. Returns {'news': [...], ...}."""
+    terms = _terms(query)
+    if not terms:
+        return {'news': [], 'events': [], 'players': []}
+    filters = {
+        News: [] if include_hidden else [News.published == True],
+        Event: [],
+        Player: [] if include_hidden else [Player.active == True],
+    }
+    backend = _fts_search if fts_available() else _like_search
+    return {
+        'news': backend(News, terms, filters[News], limit),
+        'events': backend(Event, terms, filters[Event], limit),
+        'players': backend(Player, terms, filters[Player], limit),
+    }
@@ -0,0 +1,97 @@
+import pytest
+from jinja2 import ChoiceLoader, DictLoader
+from app import create_app, db
+from app.models import User
+
+# Links to the neighbouring pages of a list, cursor links where the pagination has them
+_PAGINATION = '''
+    {% if pagination.has_prev %}<a rel="prev" href="{{ pagination.prev_url() if pagination.prev_url is defined
+        else url_for(request.endpoint, **dict(request.args, page=pagination.prev_num)) }}"></a>{% endif %}
+    {% if pagination.has_next %}<a rel="next" href="{{ pagination.next_url() if pagination.next_url is defined
+        else url_for(request.endpoint, **dict(request.args, page=pagination.next_num)) }}"></a>{% endif %}
+'''
+
+# Stand-ins for page templates that are not part of this tree. They touch the
+# same relationships the real pages render, so lazy loads show up in the counts.
+FIXTURE_TEMPLATES = {
+    'event_detail.html': '''
+        {{ event.title }}
+        {% for invite in invites %}{{ invite.player.full_name }} {{ invite.status }}{% endfor %}
+    ''',
+    'player_detail.html': '''
+        {{ player.full_name }}
+        {% for invite in upcoming_invites %}{{ invite.event.title }} {{ invite.event.date }} {{ invite.status }}{% endfor %}
+        {% for stats in attendance_stats %}{{ stats.season }} {{ stats.confirmed }}{% endfor %}
+    ''',
+    'admin/event_invites.html': '''
+        {{ event.title }}
+        {% for player in available_players %}{{ player.full_name }}{% endfor %}
+        {% for invite in invites %}{{ invite.player.full_name }} {{ invite.status }}{% endfor %}
+    ''',
+    'calendar.html': '{% for event in events %}{{ event.title }} {{ event.confirmed_count }}{% endfor %}',
+    'players.html': '{% for player in players %}{{ player.full_name }} {{ player.team }}{% endfor %}',
+    'news.html': '{% for item in news %}{{ item.title }}{% endfor %}' + _PAGINATION,
+    'admin/events.html': '{% for event in events %}{{ event.title }} {{ event.confirmed_count }}{% endfor %}'
+                         + _PAGINATION,
+    'admin/players.html': '{% for player in players %}{{ player.full_name }} {{ player.team }}{% endfor %}'
+                          + _PAGINATION,
+    'admin/news.html': '{% for item in news %}{{ item.title }} {{ item.published }}{% endfor %}' + _PAGINATION,
+    'errors/404.html': 'Seite nicht gefunden',
+    'errors/500.html': 'Interner Fehler',
+}
+
+def app_settings(**overrides):
+    """Config for a throwaway app on an in-memory database, on top of config.py."""
+    settings = {
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'SQLALCHEMY_BINDS': {},
+        'SQLALCHEMY_ENGINE_OPTIONS': {},
+        'SQLALCHEMY_REPLICA_BIND': None,
+        'CACHE_TYPE': 'null',
+        'SQL_INSTRUMENTATION': False,
+        'WTF_CSRF_ENABLED': False,
+    }
+    settings.update(overrides)
+    return settings
+
+@pytest.fixture(scope='module')
+def make_app():
+    """Factory for apps with their tables created; all are torn down after the module."""
+    apps = []
+
+    def make(**overrides):
+        app = create_app(overrides=app_settings(**overrides))
+        app.jinja_env.loader = ChoiceLoader([app.jinja_env.loader, DictLoader(FIXTURE_TEMPLATES)])
+        with app.app_context():
+            db.create_all()
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+            for engine in db.engines.values():
+                engine.dispose()
+
+@pytest.fixture
+def app(make_app):
+    """App without a pushed context: requests must not share the test's session."""
+    return make_app()
+
+@pytest.fixture
+def admin_client(app):
+    """Test client logged in as an admin user."""
+    with app.app_context():
+        user = User(username='admin', email='admin@example.org')
+        user.set_password('geheim')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
@@ -0,0 +1,87 @@
+import random
+import threading
+from functools import partial
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import select, update
+from sqlalchemy.exc import OperationalError
+from app import db
+from app.models import Event, Invite, Player
+
+def _file_app(make_app, tmp_path):
+    return make_app(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'clubconnect.sqlite'}")
+
+def _seed(connection, rows):
+    rng = random.Random(4949)
+    now = datetime.utcnow()
+    connection.execute(Player.__table__.insert(), [
+        {'first_name': 'Spieler', 'last_name': str(i), 'email': f'spieler{i}@example.org', 'created_at': now}
+        for i in range(rows)
+    ])
+    connection.execute(Event.__table__.insert(), [
+        {'title': f'Event {i}', 'event_type': 'training',
+         'date': date.today() + timedelta(days=rng.randrange(-365, 365)), 'time': time(18), 'created_at': now}
+        for i in range(rows)
+    ])
+    connection.execute(Invite.__table__.insert(), [
+        {'event_id': i + 1, 'player_id': i + 1, 'status': 'pending', 'created_at': now}
+        for i in range(rows)
+    ])
+
+def test_file_databases_get_the_sqlite_pragmas(make_app, tmp_path):
+    app = _file_app(make_app, tmp_path)
+    with app.app_context(), db.engine.connect() as connection:
+        pragma = lambda name: connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+        assert pragma('journal_mode') == 'wal'
+        assert pragma('synchronous') == 1  # NORMAL
+        assert pragma('busy_timeout') == app.config['SQLITE_BUSY_TIMEOUT']
+        assert pragma('cache_size') == app.config['SQLITE_CACHE_SIZE']
+
+def test_reads_continue_while_rsvps_are_written(make_app, tmp_path):
+    """Readers of upcoming events and RSVP writers share one file without lock errors."""
+    app = _file_app(make_app, tmp_path)
+    rows = 2000
+    with app.app_context():
+        engine = db.engine
+    with engine.begin() as connection:
+        _seed(connection, rows)
+
+    upcoming = select(Event.id, Event.title, Event.confirmed_count).where(
+        Event.date >= date.today()
+    ).order_by(Event.date, Event.time).limit(5)
+    counts = {'reads': 0, 'writes': 0}
+    errors = []
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def run(work):
+        while not stop.is_set():
+            try:
+                name = work()
+            except OperationalError as e:
+                errors.append(e)
+                return
+            with lock:
+                counts[name] += 1
+
+    def read():
+        with engine.connect() as connection:
+            connection.execute(upcoming).all()
+        return 'reads'
+
+    def write(rng):
+        with engine.begin() as connection:
+            connection.execute(update(Invite).where(Invite.id == rng.randrange(1, rows + 1))
+                               .values(status=rng.choice(['confirmed', 'declined'])))
+        return 'writes'
+
+    threads = [threading.Thread(target=run, args=(read,)) for _ in range(4)]
+    threads += [threading.Thread(target=run, args=(partial(write, random.Random(seed)),)) for seed in range(2)]
+    for thread in threads:
+        thread.start()
+    stop.wait(1.0)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert counts['reads'] > 0 and counts['writes'] > 0
@@ -0,0 +1,87 @@
+import socket
+from datetime import date, time
+import pytest
+from flask import render_template
+from app.mail import RateLimiter, build_message, render_batch, send_messages
+from app.models import Event, Player
+
+class _Handler:
+    """Records delivered mails with the connection they came over; refuses abgelehnt@ addresses."""
+
+    def __init__(self):
+        self.received = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith('abgelehnt@'):
+            return '550 Empfänger unbekannt'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received.extend((address, session.peer) for address in envelope.rcpt_tos)
+        return '250 OK'
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def smtp_server():
+    controller_module = pytest.importorskip('aiosmtpd.controller')
+    handler = _Handler()
+    controller = controller_module.Controller(handler, hostname='127.0.0.1', port=_free_port())
+    controller.start()
+    yield controller
+    controller.stop()
+
+@pytest.fixture
+def mail_app(make_app, smtp_server):
+    app = make_app(MAIL_BACKEND='smtp', MAIL_SERVER=smtp_server.hostname, MAIL_PORT=smtp_server.port,
+                   MAIL_USE_TLS=False, MAIL_USERNAME=None, MAIL_RATE_LIMIT=0, MAIL_POOL_SIZE=4)
+    with app.app_context():
+        yield app
+
+def test_pool_sends_every_message_over_reused_connections(mail_app, smtp_server):
+    recipients = [f'spieler{i}@example.org' for i in range(40)]
+
+    failures = send_messages([build_message(to, 'Test', 'Hallo') for to in recipients])
+
+    assert failures == {}
+    received = smtp_server.handler.received
+    assert sorted(address for address, _ in received) == sorted(recipients)
+    connections = {peer for _, peer in received}
+    assert len(connections) <= mail_app.config['MAIL_POOL_SIZE']
+
+def test_refused_recipient_fails_only_its_message(mail_app, smtp_server):
+    recipients = ['spieler1@example.org', 'abgelehnt@example.org', 'spieler2@example.org']
+
+    failures = send_messages([build_message(to, 'Test', 'Hallo') for to in recipients])
+
+    assert list(failures) == [1]
+    assert sorted(address for address, _ in smtp_server.handler.received) == \
+        ['spieler1@example.org', 'spieler2@example.org']
+
+def test_batch_rendering_matches_rendering_per_recipient(make_app):
+    app = make_app(CLUB_NAME='FC Test')
+    event = Event(title='Heimspiel', event_type='game', date=date(2026, 5, 9), time=time(15, 30),
+                  location='Sportplatz', description=None)
+    recipients = [
+        {'player': Player(first_name=name, last_name='Muster'),
+         'links': {'confirmed': f'https://example.org/rsvp/{name}/ja',
+                   'declined': f'https://example.org/rsvp/{name}/nein'}}
+        for name in ('Anna', 'Ben', 'Chris')
+    ]
+    with app.test_request_context():
+        bodies = render_batch('emails/invite.txt', recipients, ('player', 'links'), event=event)
+        expected = [render_template('emails/invite.txt', event=event, **recipient) for recipient in recipients]
+
+    assert bodies == expected
+
+def test_rate_limiter_waits_for_the_sliding_window(monkeypatch):
+    monkeypatch.setattr(RateLimiter, '_sent', type(RateLimiter._sent)())
+    limiter = RateLimiter(per_minute=2)
+
+    assert limiter._reserve() == 0
+    assert limiter._reserve() == 0
+    assert 59 < limiter._reserve() <= 60
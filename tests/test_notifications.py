@@ -0,0 +1,56 @@
+from datetime import date, time
+from email import message_from_binary_file
+import pytest
+from app import db
+from app.jobs import run_jobs
+from app.models import Event, Invite, News, Player
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    return make_app(MAIL_BACKEND='file', MAIL_FILE_SINK_DIR=str(tmp_path / 'mail'), CLUB_NAME='FC Test')
+
+def _mailed_to(app, tmp_path):
+    """Run the due jobs and return the recipients of all mails written so far."""
+    with app.app_context():
+        while run_jobs('test'):
+            pass
+    recipients = []
+    for path in sorted((tmp_path / 'mail').glob('*.eml')):
+        with open(path, 'rb') as f:
+            recipients.append(message_from_binary_file(f)['To'])
+    return recipients
+
+def test_invite_after_deleting_the_newest_invite_is_mailed(app, admin_client, tmp_path):
+    with app.app_context():
+        event = Event(title='Training', event_type='training', date=date.today(), time=time(18))
+        first = Player(first_name='Erster', last_name='Spieler', email='x@example.org')
+        second = Player(first_name='Zweiter', last_name='Spieler', email='y@example.org')
+        db.session.add_all([event, first, second])
+        db.session.commit()
+        event_id, first_id, second_id = event.id, first.id, second.id
+
+    admin_client.post(f'/admin/event/{event_id}/invite/{first_id}')
+    assert _mailed_to(app, tmp_path) == ['x@example.org']
+
+    with app.app_context():
+        invite_id = Invite.query.filter_by(player_id=first_id).one().id
+    admin_client.post(f'/admin/invite/{invite_id}/delete')
+    admin_client.post(f'/admin/event/{event_id}/invite/{second_id}')
+
+    assert sorted(_mailed_to(app, tmp_path)) == ['x@example.org', 'y@example.org']
+
+def test_recreated_news_is_mailed_again(app, admin_client, tmp_path):
+    with app.app_context():
+        db.session.add(Player(first_name='Erster', last_name='Spieler', email='x@example.org'))
+        db.session.commit()
+    form = {'title': 'Saisonstart', 'content': 'Es geht los.', 'published': 'y'}
+
+    admin_client.post('/admin/news/new', data=form)
+    assert _mailed_to(app, tmp_path) == ['x@example.org']
+
+    with app.app_context():
+        news_id = News.query.one().id
+    admin_client.post(f'/admin/news/{news_id}/delete')
+    admin_client.post('/admin/news/new', data=dict(form, title='Saisonstart verschoben'))
+
+    assert _mailed_to(app, tmp_path) == ['x@example.org', 'x@example.org']
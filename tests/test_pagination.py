@@ -0,0 +1,39 @@
+from sqlalchemy import event
+from app import db
+from app.models import Player
+from app.pagination import keyset_paginate
+
+COLUMNS = [Player.last_name, Player.first_name, Player.id]
+
+def test_keyset_pages_have_the_pagination_interface(make_app):
+    app = make_app()
+    with app.test_request_context('/admin/players'):
+        db.session.add_all([Player(first_name='Spieler', last_name=f'{i:02d}', email=f'{i}@example.org')
+                            for i in range(10)])
+        db.session.commit()
+
+        first = keyset_paginate(Player.query, COLUMNS, per_page=3)
+        assert (first.page, first.prev_num, first.next_num) == (1, None, 2)
+        assert (first.total, first.pages, list(first.iter_pages())) == (10, 4, [1, 2, 3, 4])
+
+        second = keyset_paginate(Player.query, COLUMNS, first.next_cursor, per_page=3)
+        third = keyset_paginate(Player.query, COLUMNS, second.next_cursor, per_page=3)
+        assert (third.page, third.prev_num, third.next_num, third.first, third.last) == (3, 2, 4, 7, 9)
+
+        # A numbered link to the same page gets the same rows from the offset pagination
+        offset = Player.query.order_by(*COLUMNS).paginate(page=3, per_page=3)
+        assert [player.id for player in offset.items] == [player.id for player in third.items]
+
+        back = keyset_paginate(Player.query, COLUMNS, third.prev_cursor, per_page=3)
+        assert back.page == 2
+        assert [player.id for player in back.items] == [player.id for player in second.items]
+
+def test_total_is_counted_only_when_asked_for(make_app):
+    app = make_app()
+    with app.test_request_context('/admin/players'):
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+        page = keyset_paginate(Player.query, COLUMNS, per_page=3)
+        assert not any('count(' in statement for statement in statements)
+        assert page.total == 0 and page.pages == 0 and list(page.iter_pages()) == []
+        assert any('count(' in statement for statement in statements)
@@ -0,0 +1,195 @@
+import random
+import re
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+import pytest
+from sqlalchemy import event, select
+from app import db
+from app.jobs import claim_jobs
+from app.models import Event, EventSeries, Invite, Job, News, Player, PlayerAttendanceStats, User
+from app.rsvp import promote_waitlist, rsvp_token
+
+# Rows seeded per table; enough for the planner to prefer an index over a scan
+ROWS = 20000
+
+# Pages whose queries must be served by an index, with the query strings they are used with
+HOT_PAGES = [
+    '/',
+    '/calendar',
+    '/calendar?type=game',
+    '/calendar.json',
+    '/event/1',
+    '/players',
+    '/players?team=A-Team',
+    '/player/1',
+    '/news',
+    '/news?page=3',
+    '/admin/events',
+    '/admin/events?page=3',
+    '/admin/event/1/invites',
+    '/admin/players',
+    '/admin/players?team=A-Team',
+    '/admin/news',
+    '/admin/statistics',
+    '/admin/statistics?event_type=game&team=A-Team',
+]
+
+# Tables small by design (one row per config entry or series), a scan of them is fine
+SMALL_TABLES = {'cache_version', 'clothing_rule', 'event_series'}
+
+# A step reading a whole table or index: "SCAN event", "SCAN player USING INDEX ix_player_name",
+# "SCAN news USING COVERING INDEX ix_news_created"
+_SCAN = re.compile(r'SCAN (\w+)(?: USING (?:COVERING )?INDEX \w+)?$')
+_LIMIT = re.compile(r'\bLIMIT\b', re.IGNORECASE)
+_COUNT = re.compile(r'^\s*SELECT count\(\*\)', re.IGNORECASE)
+
+def _seed(connection, rows):
+    rng = random.Random(4949)
+    teams = ['A-Team', 'B-Team', 'Jugend', 'Senioren']
+    event_types = ['training', 'game', 'meeting', 'tournament']
+    statuses = ['pending', 'confirmed', 'declined']
+    start = date.today() - timedelta(days=3650)
+    now = datetime.utcnow()
+    connection.execute(Player.__table__.insert(), [
+        {'first_name': f'Vorname{i}', 'last_name': f'Nachname{rng.randrange(rows)}',
+         'email': f'spieler{i}@example.org', 'team': rng.choice(teams),
+         'active': rng.random() < 0.8, 'created_at': now}
+        for i in range(rows)
+    ])
+    connection.execute(Event.__table__.insert(), [
+        {'title': f'Event {i}', 'event_type': rng.choice(event_types),
+         'date': start + timedelta(days=rng.randrange(4000)), 'time': time(rng.randrange(8, 21)),
+         'max_participants': 15, 'created_at': now}
+        for i in range(rows)
+    ])
+    connection.execute(Invite.__table__.insert(), [
+        {'event_id': i // 20 + 1, 'player_id': i % rows + 1,
+         'status': rng.choice(statuses), 'created_at': now}
+        for i in range(rows)
+    ])
+    connection.execute(News.__table__.insert(), [
+        {'title': f'News {i}', 'content': 'Inhalt', 'published': rng.random() < 0.9,
+         'created_at': now - timedelta(minutes=i), 'updated_at': now}
+        for i in range(rows)
+    ])
+    connection.execute(Job.__table__.insert(), [
+        {'kind': 'invite_email', 'payload': {}, 'status': 'done' if i % 100 else 'queued',
+         'run_at': now - timedelta(minutes=i), 'created_at': now}
+        for i in range(rows)
+    ])
+    connection.execute(EventSeries.__table__.insert(), [
+        {'title': f'Training {team}', 'event_type': 'training', 'time': time(18), 'frequency': 'weekly',
+         'interval': 1, 'weekdays': 'TU,TH', 'start_date': start, 'created_at': now, 'updated_at': now}
+        for team in teams
+    ])
+
+@pytest.fixture(scope='module')
+def plan_app(make_app):
+    app = make_app()
+    with app.app_context():
+        with db.engine.begin() as connection:
+            _seed(connection, ROWS)
+        Event.refresh_invite_counts()
+        PlayerAttendanceStats.rebuild(db.session.connection())
+        user = User(username='admin', email='admin@example.org')
+        user.set_password('geheim')
+        db.session.add(user)
+        db.session.commit()
+        db.session.connection().exec_driver_sql('ANALYZE')
+        db.session.commit()
+        app.config['TEST_ADMIN_ID'] = user.id
+    return app
+
+@pytest.fixture(scope='module')
+def client(plan_app):
+    client = plan_app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(plan_app.config['TEST_ADMIN_ID'])
+        session['_fresh'] = True
+    return client
+
+@contextmanager
+def _recorded(engine):
+    """Collect the (statement, parameters) of the queries and DML run in this block."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'WITH', 'UPDATE', 'DELETE')):
+            statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+def _full_scans(engine, statements):
+    """(plan, statement) of the statements that read a whole table or index.
+
+    Two index scans are fine: one that delivers the rows in the order of a
+    LIMIT query, as the walk stops after the page, and one that counts a whole
+    list, such as the total of an offset pagination, as that needs every entry.
+    """
+    failures = []
+    with engine.connect() as connection:
+        for statement, parameters in statements:
+            plan = [row[-1] for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+            ordered_walk = _LIMIT.search(statement) and not any('TEMP B-TREE' in step for step in plan)
+            index_scan_ok = ordered_walk or _COUNT.match(statement)
+            for step in plan:
+                match = _SCAN.match(step)
+                if match is None or match.group(1) not in db.metadata.tables \
+                        or match.group(1) in SMALL_TABLES:
+                    continue
+                if index_scan_ok and 'INDEX' in step:
+                    continue
+                failures.append(('; '.join(plan), ' '.join(statement.split())))
+                break
+    return failures
+
+def _assert_indexed(app, request):
+    with app.app_context():
+        engine = db.engine
+    with _recorded(engine) as statements:
+        response = request()
+    assert response.status_code in (200, 302), response.status_code
+    assert statements
+    failures = _full_scans(engine, statements)
+    assert not failures, '\n'.join(f'{plan}\n    {sql}' for plan, sql in failures)
+    return response
+
+@pytest.mark.parametrize('url', HOT_PAGES)
+def test_hot_pages_use_an_index(plan_app, client, url):
+    _assert_indexed(plan_app, lambda: client.get(url))
+
+@pytest.mark.parametrize('url', ['/news', '/admin/events', '/admin/players', '/admin/news'])
+def test_cursor_pages_use_an_index(plan_app, client, url):
+    first = client.get(url).get_data(as_text=True)
+    next_url = re.search(r'rel="next" href="([^"]+)"', first).group(1).replace('&amp;', '&')
+    assert 'cursor=' in next_url
+    second = _assert_indexed(plan_app, lambda: client.get(next_url)).get_data(as_text=True)
+    prev_url = re.search(r'rel="prev" href="([^"]+)"', second).group(1).replace('&amp;', '&')
+    _assert_indexed(plan_app, lambda: client.get(prev_url))
+
+@pytest.mark.parametrize('status', ['confirmed', 'declined'])
+def test_rsvp_uses_an_index(plan_app, client, status):
+    with plan_app.app_context():
+        invite = db.session.scalars(select(Invite).where(
+            Invite.event_id == 2, Invite.status != status
+        )).first()
+        token = rsvp_token(invite, status)
+    _assert_indexed(plan_app, lambda: client.post(f'/rsvp/{token}'))
+
+def test_waitlist_promotion_uses_an_index(plan_app):
+    with plan_app.app_context():
+        with _recorded(db.engine) as statements:
+            promote_waitlist(3)
+            db.session.commit()
+        assert not _full_scans(db.engine, statements)
+
+def test_job_claim_uses_an_index(plan_app):
+    with plan_app.app_context():
+        with _recorded(db.engine) as statements:
+            claim_jobs('plan-check', 50)
+        assert not _full_scans(db.engine, statements)
+
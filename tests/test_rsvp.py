@@ -0,0 +1,156 @@
+import random
+import threading
+from datetime import date, time
+import pytest
+from sqlalchemy import func, select
+from app import db
+from app.models import Event, Invite, Player, PlayerAttendanceStats, INVITE_STATUS_COUNTERS
+from app.rsvp import RSVP_STATUSES, rsvp_token, waitlist_rank
+
+# Players answering at the same time, the load an RSVP round of the club has to take
+PLAYERS = 200
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    # A file database, so the answering threads use connections of their own
+    return make_app(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'rsvp.sqlite'}")
+
+def _invited_event(players, seats=None):
+    """An event with `players` pending invites; returns its id and the RSVP tokens
+    per invite, in the order of the invite ids."""
+    event = Event(title='RSVP-Test', event_type='game', date=date.today(), time=time(18),
+                  max_participants=seats)
+    db.session.add(event)
+    db.session.add_all([Player(first_name='Spieler', last_name=str(i), email=f'rsvp{i}@example.org')
+                        for i in range(players)])
+    db.session.commit()
+    Invite.bulk_create(event.id, select(Player.id))
+    db.session.commit()
+    tokens = [{status: rsvp_token(invite, status) for status in RSVP_STATUSES}
+              for invite in Invite.query.filter_by(event_id=event.id).order_by(Invite.id)]
+    return event.id, tokens
+
+def _answer_concurrently(app, tokens, rounds):
+    """Every player confirms, then answers `rounds` times at random, all players at once.
+    Returns the number of responses per status code."""
+    codes = {}
+    lock = threading.Lock()
+    barrier = threading.Barrier(len(tokens))
+
+    def respond(player_tokens, seed):
+        client = app.test_client()
+        rng = random.Random(seed)
+        answers = ['confirmed'] + [rng.choice(RSVP_STATUSES) for _ in range(rounds)]
+        barrier.wait()
+        for answer in answers:
+            code = client.post(f'/rsvp/{player_tokens[answer]}').status_code
+            with lock:
+                codes[code] = codes.get(code, 0) + 1
+
+    threads = [threading.Thread(target=respond, args=(player_tokens, seed))
+               for seed, player_tokens in enumerate(tokens)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return codes
+
+def _status_counts(event_id):
+    return dict(db.session.execute(
+        select(Invite.status, func.count(Invite.id)).where(Invite.event_id == event_id)
+        .group_by(Invite.status)
+    ).all())
+
+def _attendance_stats():
+    return sorted(db.session.execute(select(
+        PlayerAttendanceStats.player_id, PlayerAttendanceStats.event_type, PlayerAttendanceStats.season,
+        PlayerAttendanceStats.invited, PlayerAttendanceStats.confirmed,
+        PlayerAttendanceStats.declined, PlayerAttendanceStats.pending
+    )).all())
+
+def test_concurrent_answers_keep_counters_and_statistics(app):
+    with app.app_context():
+        event_id, tokens = _invited_event(PLAYERS)
+
+    codes = _answer_concurrently(app, tokens, rounds=3)
+
+    assert set(codes) == {200}
+    with app.app_context():
+        event = db.session.get(Event, event_id)
+        counts = _status_counts(event_id)
+        for status, column in INVITE_STATUS_COUNTERS.items():
+            assert getattr(event, column) == counts.get(status, 0), column
+        # The shifted statistics equal a recount from the invites
+        shifted = _attendance_stats()
+        PlayerAttendanceStats.rebuild(db.session.connection())
+        assert shifted == _attendance_stats()
+        db.session.rollback()
+
+def test_concurrent_answers_respect_the_seat_limit(app):
+    seats = 150
+    with app.app_context():
+        event_id, tokens = _invited_event(PLAYERS, seats)
+
+    codes = _answer_concurrently(app, tokens, rounds=3)
+
+    assert set(codes) == {200}
+    with app.app_context():
+        event = db.session.get(Event, event_id)
+        counts = _status_counts(event_id)
+        confirmed, waitlisted = counts.get('confirmed', 0), counts.get('waitlisted', 0)
+        assert confirmed <= seats
+        # Nobody waits while a seat is free
+        assert not waitlisted or confirmed == seats
+        positions = db.session.scalars(select(Invite.waitlist_position).where(
+            Invite.event_id == event_id, Invite.status == 'waitlisted'
+        )).all()
+        assert None not in positions and len(set(positions)) == len(positions)
+        for status, column in INVITE_STATUS_COUNTERS.items():
+            assert getattr(event, column) == counts.get(status, 0), column
+
+def test_decline_promotes_the_head_of_the_waitlist(app):
+    with app.app_context():
+        event_id, tokens = _invited_event(3, seats=1)
+    client = app.test_client()
+
+    def statuses():
+        with app.app_context():
+            invites = Invite.query.filter_by(event_id=event_id).order_by(Invite.id).all()
+            return [(invite.status, waitlist_rank(invite) if invite.status == 'waitlisted' else None)
+                    for invite in invites]
+
+    for player_tokens in tokens:
+        assert client.post(f"/rsvp/{player_tokens['confirmed']}").status_code == 200
+    assert statuses() == [('confirmed', None), ('waitlisted', 1), ('waitlisted', 2)]
+
+    assert client.post(f"/rsvp/{tokens[0]['declined']}").status_code == 200
+    assert statuses() == [('declined', None), ('confirmed', None), ('waitlisted', 1)]
+    with app.app_context():
+        assert db.session.get(Event, event_id).confirmed_count == 1
+
+def test_token_answers_only_the_invite_it_was_issued_for(app):
+    with app.app_context():
+        event_id, _ = _invited_event(2)
+        invite = Invite.query.filter_by(event_id=event_id).first()
+        invite_id, player_id = invite.id, invite.player_id
+        token = rsvp_token(invite, 'confirmed')
+        # The invite is deleted and its id reused for another player's invite
+        db.session.delete(invite)
+        db.session.commit()
+        other = Player(first_name='Neu', last_name='Spieler', email='neu@example.org')
+        db.session.add(other)
+        db.session.flush()
+        db.session.add(Invite(id=invite_id, event_id=event_id, player_id=other.id))
+        db.session.commit()
+
+    assert app.test_client().post(f'/rsvp/{token}').status_code == 404
+    with app.app_context():
+        assert db.session.get(Invite, invite_id).status == 'pending'
+        assert db.session.get(Invite, invite_id).player_id != player_id
+
+def test_expired_token_is_rejected(app):
+    with app.app_context():
+        _, tokens = _invited_event(1)
+    app.config['RSVP_TOKEN_MAX_AGE'] = -1
+
+    assert app.test_client().post(f"/rsvp/{tokens[0]['confirmed']}").status_code == 404
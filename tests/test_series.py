@@ -0,0 +1,26 @@
+from datetime import date, time
+from app import db
+from app.models import Event, EventSeries
+
+def test_cached_occurrence_page_redirects_once_materialized(app, admin_client):
+    day = date.today()
+    with app.app_context():
+        series = EventSeries(title='Training', event_type='training', time=time(18),
+                             frequency='weekly', interval=1, start_date=day)
+        db.session.add(series)
+        db.session.commit()
+        series_id = series.id
+    url = f'/series/{series_id}/{day.isoformat()}'
+
+    response = admin_client.get(url)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert admin_client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+    admin_client.post(f'/admin/series/{series_id}/{day.isoformat()}/invites')
+    with app.app_context():
+        event_id = Event.query.filter_by(series_id=series_id, occurrence_date=day).one().id
+
+    response = admin_client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith(f'/event/{event_id}')
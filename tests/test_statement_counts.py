@@ -0,0 +1,127 @@
+from datetime import date, time, timedelta
+import pytest
+from sqlalchemy import select
+from app import db
+from app.models import Event, EventSeries, Invite, News, Player, PlayerAttendanceStats
+
+# Statements a page with an invite list may issue, whatever the number of invites
+MAX_STATEMENTS = 12
+
+@pytest.fixture
+def app(make_app):
+    return make_app(SQL_INSTRUMENTATION=True)
+
+def _add_players(count):
+    start = Player.query.count()
+    players = [Player(first_name='Spieler', last_name=f'{start + i:04d}',
+                      email=f'spieler{start + i}@example.org') for i in range(count)]
+    db.session.add_all(players)
+    db.session.commit()
+    return [player.id for player in players]
+
+def _add_events(count):
+    start = Event.query.count()
+    events = [Event(title=f'Training {start + i}', event_type='training',
+                    date=date.today() + timedelta(days=start + i + 1), time=time(18))
+              for i in range(count)]
+    db.session.add_all(events)
+    db.session.commit()
+    return [event.id for event in events]
+
+def _statements(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return int(response.headers['X-Query-Count'])
+
+def _assert_bounded(app, client, url, grow):
+    """The statement count of `url` stays the same when `grow()` adds rows to its list."""
+    with app.app_context():
+        grow()
+    client.get(url)  # fills per-process caches such as the clothing rules
+    before = _statements(client, url)
+    with app.app_context():
+        grow()
+    after = _statements(client, url)
+    assert before == after
+    assert after <= MAX_STATEMENTS
+
+def test_event_detail_loads_invited_players_with_the_invites(app, admin_client):
+    with app.app_context():
+        event_id = _add_events(1)[0]
+
+    def invite_more():
+        player_ids = _add_players(10)
+        Invite.bulk_create(event_id, select(Player.id).where(Player.id.in_(player_ids)))
+        db.session.commit()
+
+    _assert_bounded(app, admin_client, f'/event/{event_id}', invite_more)
+
+def test_player_detail_loads_invited_events_with_the_invites(app, admin_client):
+    with app.app_context():
+        player_id = _add_players(1)[0]
+
+    def invite_to_more():
+        db.session.add_all([Invite(event_id=event_id, player_id=player_id)
+                            for event_id in _add_events(10)])
+        db.session.commit()
+
+    _assert_bounded(app, admin_client, f'/player/{player_id}', invite_to_more)
+
+def test_admin_event_invites_loads_players_with_the_invites(app, admin_client):
+    with app.app_context():
+        event_id = _add_events(1)[0]
+
+    def invite_more():
+        player_ids = _add_players(10)
+        Invite.bulk_create(event_id, select(Player.id).where(Player.id.in_(player_ids[:5])))
+        db.session.commit()
+
+    _assert_bounded(app, admin_client, f'/admin/event/{event_id}/invites', invite_more)
+
+def _add_club_activity():
+    """Add players, events of today with invites for all of them, news and a series."""
+    player_ids = _add_players(5)
+    events = [Event(title=f'Spiel {player_id}', event_type='game', date=date.today(), time=time(20))
+              for player_id in player_ids]
+    db.session.add_all(events)
+    db.session.flush()
+    for event in events:
+        Invite.bulk_create(event.id, select(Player.id).where(Player.id.in_(player_ids)))
+    db.session.add_all([News(title=f'Training fällt aus {i}', content='Wegen Regen.', published=True)
+                        for i in range(5)])
+    db.session.add(EventSeries(title='Training', event_type='training', time=time(18),
+                               frequency='weekly', interval=1, start_date=date.today()))
+    PlayerAttendanceStats.rebuild(db.session.connection())
+    db.session.commit()
+
+# Statements each list page may issue, whatever the number of rows it lists
+PAGE_LIMITS = {
+    '/': 8,
+    '/calendar': 6,
+    '/calendar.json': 6,
+    '/players': 3,
+    '/news': 3,
+    '/search?q=Training': 6,
+    '/series/1/{today}': 8,
+    '/admin/dashboard': 3,
+    '/admin/events': 2,
+    '/admin/players': 2,
+    '/admin/news': 2,
+    '/admin/series': 2,
+    '/admin/series/1': 4,
+    '/admin/statistics': 4,
+}
+
+@pytest.mark.parametrize('url, limit', PAGE_LIMITS.items())
+def test_list_pages_issue_a_bounded_number_of_statements(app, admin_client, url, limit):
+    url = url.format(today=date.today().isoformat())
+    with app.app_context():
+        _add_club_activity()
+    admin_client.get(url)
+    before = _statements(admin_client, url)
+    with app.app_context():
+        _add_club_activity()
+    after = _statements(admin_client, url)
+
+    assert before == after
+    assert after <= limit